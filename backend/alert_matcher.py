@@ -0,0 +1,173 @@
+"""
+Spatially indexed matcher for earthquake alert subscriptions
+Each subscription is filed under the coarse lat/lon cells its alert circle
+overlaps, so a batch of new events only meets the subscriptions near it; the
+magnitude and distance checks for the whole batch run as one numpy pass
+"""
+import math
+import time
+
+import numpy as np
+
+from catalog import EARTH_RADIUS_KM, radius_bbox
+
+
+class _Index:
+    """Immutable snapshot of the subscriptions as arrays; rebuilt whenever they change"""
+
+    def __init__(self, version, keys, subs, lat, lon, magnitude, radius, cells, wide):
+        self.version = version
+        self.keys = keys
+        self.subs = subs
+        self.lat = lat
+        self.lon = lon
+        self.magnitude = magnitude
+        self.radius = radius
+        self.cells = cells
+        self.wide = wide
+        self.min_magnitude = float(magnitude.min()) if len(magnitude) else math.inf
+
+
+class AlertMatcher:
+    """
+    Subscriptions (dicts with lat, lon, radius in km and a minimum magnitude)
+    keyed by user id.
+
+    add() / remove() only touch the dict and bump a version; the index is
+    rebuilt on the next match(), so a burst of sign-ups costs one rebuild. Circles too big for
+    `max_cells` cells (or wrapping the antimeridian) go on a short "wide"
+    list that every event is checked against.
+    """
+
+    def __init__(self, cell_deg: float = 5.0, max_cells: int = 128):
+        self.cell_deg = cell_deg
+        self.max_cells = max_cells
+        self.rows = math.ceil(180 / cell_deg)
+        self.cols = math.ceil(360 / cell_deg)
+        self.subscriptions = {}
+        self._version = 0
+        self._index = None
+        self.builds = 0
+        self.events_checked = 0
+        self.pairs_checked = 0
+        self.matches = 0
+        self.last_match_ms = None
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def add(self, key, sub: dict):
+        self.subscriptions[key] = sub
+        self._version += 1
+
+    def replace_all(self, subscriptions: dict):
+        """Swap in a freshly loaded set of subscriptions"""
+        self.subscriptions = dict(subscriptions)
+        self._version += 1
+
+    def remove(self, key) -> bool:
+        found = self.subscriptions.pop(key, None) is not None
+        if found:
+            self._version += 1
+        return found
+
+    # ── index ────────────────────────────────────────────────────────
+    def _cell(self, lat: float, lon: float) -> int:
+        row = min(self.rows - 1, max(0, math.floor((lat + 90) / self.cell_deg)))
+        col = math.floor((lon + 180) / self.cell_deg) % self.cols
+        return row * self.cols + col
+
+    def _circle_cells(self, sub: dict):
+        """Cells overlapped by a subscription's circle, or None if it belongs on the wide list"""
+        min_lat, min_lon, max_lat, max_lon = radius_bbox(sub['lat'], sub['lon'], sub['radius'])
+        if min_lon <= -180 and max_lon >= 180:
+            return None
+        row0, col0 = divmod(self._cell(min_lat, min_lon), self.cols)
+        row1, col1 = divmod(self._cell(max_lat, max_lon), self.cols)
+        if col1 < col0 or (row1 - row0 + 1) * (col1 - col0 + 1) > self.max_cells:
+            return None
+        return [row * self.cols + col for row in range(row0, row1 + 1) for col in range(col0, col1 + 1)]
+
+    def _build(self) -> _Index:
+        version = self._version
+        items = list(self.subscriptions.items())
+        keys = [key for key, _ in items]
+        subs = [sub for _, sub in items]
+        cells, wide = {}, []
+        for i, sub in enumerate(subs):
+            overlapped = self._circle_cells(sub)
+            if overlapped is None:
+                wide.append(i)
+            else:
+                for cell in overlapped:
+                    cells.setdefault(cell, []).append(i)
+        self.builds += 1
+        return _Index(
+            version, keys, subs,
+            np.radians(np.array([s['lat'] for s in subs], dtype=np.float64)),
+            np.radians(np.array([s['lon'] for s in subs], dtype=np.float64)),
+            np.array([s['magnitude'] for s in subs], dtype=np.float64),
+            np.array([s['radius'] for s in subs], dtype=np.float64),
+            {cell: np.array(members, dtype=np.intp) for cell, members in cells.items()},
+            np.array(wide, dtype=np.intp),
+        )
+
+    # ── matching ─────────────────────────────────────────────────────
+    def match(self, events: list) -> list:
+        """Every (event, user key, subscription, distance_km) where the event is in range and strong enough"""
+        # Runs in a worker thread: work on one snapshot, subscribe/unsubscribe only bump the version
+        index = self._index
+        if index is None or index.version != self._version:
+            index = self._index = self._build()
+        started = time.perf_counter()
+        # Magnitude prefilter: nobody wants events below the lowest threshold
+        events = [e for e in events
+                  if e.get('lat') is not None and e.get('lon') is not None
+                  and e.get('mag') is not None and e['mag'] >= index.min_magnitude]
+        if not events:
+            return []
+
+        event_pos, sub_pos = [], []
+        for i, event in enumerate(events):
+            nearby = index.cells.get(self._cell(event['lat'], event['lon']))
+            for members in (nearby, index.wide):
+                if members is not None and len(members):
+                    event_pos.append(np.full(len(members), i, dtype=np.intp))
+                    sub_pos.append(members)
+        self.events_checked += len(events)
+        if not event_pos:
+            return []
+        event_pos = np.concatenate(event_pos)
+        sub_pos = np.concatenate(sub_pos)
+        self.pairs_checked += len(event_pos)
+
+        ev_lat = np.radians(np.array([e['lat'] for e in events], dtype=np.float64))[event_pos]
+        ev_lon = np.radians(np.array([e['lon'] for e in events], dtype=np.float64))[event_pos]
+        ev_mag = np.array([e['mag'] for e in events], dtype=np.float64)[event_pos]
+
+        # Haversine for every candidate pair at once
+        sub_lat, sub_lon = index.lat[sub_pos], index.lon[sub_pos]
+        a = (np.sin((ev_lat - sub_lat) / 2) ** 2
+             + np.cos(sub_lat) * np.cos(ev_lat) * np.sin((ev_lon - sub_lon) / 2) ** 2)
+        distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+        hit = (ev_mag >= index.magnitude[sub_pos]) & (distance <= index.radius[sub_pos])
+
+        matches = [(events[e], index.keys[s], index.subs[s], float(d))
+                   for e, s, d in zip(event_pos[hit], sub_pos[hit], distance[hit])]
+        self.matches += len(matches)
+        self.last_match_ms = round((time.perf_counter() - started) * 1000, 2)
+        return matches
+
+    def stats(self) -> dict:
+        index = self._index
+        return {
+            "subscriptions": len(self.subscriptions),
+            "cell_deg": self.cell_deg,
+            "indexed_cells": len(index.cells) if index else None,
+            "wide_subscriptions": len(index.wide) if index else None,
+            "builds": self.builds,
+            "events_checked": self.events_checked,
+            "pairs_checked": self.pairs_checked,
+            "matches": self.matches,
+            "last_match_ms": self.last_match_ms,
+        }
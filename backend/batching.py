@@ -0,0 +1,95 @@
+"""
+Dynamic micro-batching for the single-row prediction endpoints
+Concurrent requests for the same model are collected for a short window (or
+until max_batch rows) and scored with one vectorized call; each caller gets its
+own row of the result back
+"""
+import asyncio
+import time
+
+# Upper bounds of the batch-size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    score_batch(items) -> results is blocking and runs through `run`
+    (e.g. InferencePool.run); results must line up with items.
+    """
+
+    def __init__(self, name: str, score_batch, run, max_batch: int = 32, window_ms: float = 2.0):
+        self.name = name
+        self.score_batch = score_batch
+        self.run = run
+        self.max_batch = max(1, max_batch)
+        self.window = max(0.0, window_ms) / 1000
+        self._queue = []
+        self._timer = None
+        self._tasks = set()
+        self.requests = 0
+        self.batches = 0
+        self.peak_queue = 0
+        self.wait_total_ms = 0.0
+        self.histogram = {bound: 0 for bound in BATCH_SIZE_BUCKETS}
+        self.histogram['+inf'] = 0
+
+    async def submit(self, item):
+        """Queue one item and wait for its result"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((item, future, time.perf_counter()))
+        self.requests += 1
+        self.peak_queue = max(self.peak_queue, len(self._queue))
+        if len(self._queue) >= self.max_batch or self.window == 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue:
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            # Callers that gave up (client disconnect) are dropped before scoring
+            batch = [entry for entry in batch if not entry[1].done()]
+            if batch:
+                task = asyncio.ensure_future(self._score(batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, batch):
+        now = time.perf_counter()
+        self.batches += 1
+        self.wait_total_ms += sum(now - queued_at for _, _, queued_at in batch) * 1000
+        bucket = next((b for b in BATCH_SIZE_BUCKETS if len(batch) <= b), '+inf')
+        self.histogram[bucket] += 1
+        try:
+            results = await self.run(self.score_batch, [item for item, _, _ in batch])
+        except asyncio.CancelledError:
+            for _, future, _ in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "queue_depth": len(self._queue),
+            "peak_queue_depth": self.peak_queue,
+            "inflight_batches": len(self._tasks),
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+            "avg_wait_ms": round(self.wait_total_ms / self.requests, 3) if self.requests else 0.0,
+            "batch_size_histogram": {str(k): v for k, v in self.histogram.items()},
+        }
@@ -0,0 +1,70 @@
+"""
+Micro-benchmark: single-row inference, pandas path vs FeatureAssembler + FusedModel
+Usage: python bench_features.py [iterations]   (reads models from ML_MODELS_PATH)
+"""
+import os
+import sys
+import time
+import warnings
+
+import joblib
+
+from features import FeatureAssembler, FusedModel
+
+warnings.filterwarnings('ignore')
+
+ML_MODELS_PATH = os.getenv('ML_MODELS_PATH', r'C:\Users\bhupi\Sismicity\ml')
+
+SAMPLE = {
+    'depth': 12.5, 'lat': 28.2, 'lon': 84.7,
+    'rolling_count_7d': 14, 'rolling_count_30d': 61,
+    'rolling_mean_mag_30d': 4.4, 'days_since_last_major': 42,
+}
+
+# (label, model candidates, scaler, features, proba); magnitude_predictor.pkl falls back to magnitude_xgb.pkl
+MODELS = [
+    ('magnitude', ['magnitude_predictor.pkl', 'magnitude_xgb.pkl'], 'magnitude_scaler.pkl', 'magnitude_features.pkl', False),
+    ('classifier', ['major_event_classifier.pkl'], 'classifier_scaler.pkl', 'classifier_features.pkl', True),
+]
+
+
+def per_call_us(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main(iterations: int):
+    from main import build_features
+
+    for label, model_files, scaler_file, features_file, proba in MODELS:
+        model_path = next((os.path.join(ML_MODELS_PATH, f) for f in model_files
+                           if os.path.exists(os.path.join(ML_MODELS_PATH, f))), None)
+        if model_path is None:
+            print(f"{label}: model file not found, skipped")
+            continue
+        model = joblib.load(model_path)
+        scaler = joblib.load(os.path.join(ML_MODELS_PATH, scaler_file))
+        features = joblib.load(os.path.join(ML_MODELS_PATH, features_file))
+
+        def pandas_path():
+            df = build_features(SAMPLE)
+            X = scaler.transform(df[[f for f in features if f in df.columns]].fillna(0))
+            return model.predict_proba(X)[0][1] if proba else model.predict(X)[0]
+
+        assembler = FeatureAssembler(features)
+        fused = FusedModel(scaler, model, features, proba=proba)
+
+        def fast_path():
+            return fused(assembler.assemble(SAMPLE))
+
+        before, after = per_call_us(pandas_path, iterations), per_call_us(fast_path, iterations)
+        drift = abs(float(pandas_path()) - fast_path())
+        print(f"{label:<11} pandas {before:>10.1f} us   fused {after:>8.1f} us   "
+              f"x{before / after:>6.1f}   |diff| {drift:.2e}   compiled={fused.compiled}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
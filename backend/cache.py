@@ -0,0 +1,236 @@
+"""
+Read-through response cache for the SeismoIQ read endpoints
+Keys combine endpoint + normalized params + the catalog data version, so bumping
+the version on ingest invalidates every cached response at once
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.encoders import jsonable_encoder
+
+
+class MemoryCacheBackend:
+    """Per-process LRU with a TTL per entry"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.evictions = 0
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key, value, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    async def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    async def version(self) -> int:
+        return self._version
+
+    async def bump_version(self) -> int:
+        with self._lock:
+            self._version += 1
+            # Entries under the old version can never be hit again
+            self._entries.clear()
+            return self._version
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Shared cache for multi-worker deployments (needs the `redis` package)"""
+
+    VERSION_KEY = "seismoiq:catalog_version"
+
+    def __init__(self, url: str, prefix: str = "seismoiq:cache:"):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+        self.evictions = 0
+
+    async def get(self, key):
+        raw = await self._redis.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key, value, ttl: float):
+        await self._redis.set(self.prefix + key, json.dumps(value), ex=max(1, int(ttl)))
+
+    async def delete(self, key):
+        await self._redis.delete(self.prefix + key)
+
+    async def clear(self):
+        async for key in self._redis.scan_iter(match=self.prefix + "*"):
+            await self._redis.delete(key)
+
+    async def version(self) -> int:
+        return int(await self._redis.get(self.VERSION_KEY) or 0)
+
+    async def bump_version(self) -> int:
+        # Old keys simply stop matching and age out via their TTL
+        return int(await self._redis.incr(self.VERSION_KEY))
+
+    def size(self):
+        return None
+
+
+class ResponseCache:
+    def __init__(self, backend=None, ttl: float = 300):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._inflight = {}
+
+    @staticmethod
+    def normalize(params: dict) -> str:
+        return json.dumps({k: v for k, v in params.items() if v is not None}, sort_keys=True, default=str)
+
+    async def key(self, endpoint: str, params: dict) -> str:
+        return f"{endpoint}:v{await self.backend.version()}:{self.normalize(params)}"
+
+    async def get_or_compute(self, endpoint: str, params: dict, compute):
+        """
+        Return the cached response or await compute() and store its result.
+        Concurrent misses on the same key share one computation.
+        """
+        key = await self.key(endpoint, params)
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = jsonable_encoder(await compute())
+            await self.backend.set(key, value, self.ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; don't leave "exception never retrieved" noise
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def bump_version(self) -> int:
+        return await self.backend.bump_version()
+
+    async def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "data_version": await self.backend.version(),
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.backend.evictions,
+            "ttl_seconds": self.ttl,
+        }
+
+
+class PredictionCache:
+    """
+    LRU of model outputs keyed on (model, model version, inputs snapped to a grid).
+
+    Inputs are quantized *before* scoring, so a cached answer is exactly the
+    model's output for the snapped inputs no matter which request filled it.
+    """
+
+    def __init__(self, max_entries: int = 4096, step: float = 0.01):
+        self.max_entries = max_entries
+        self.step = step
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def quantize(self, data: dict) -> dict:
+        if not self.step:
+            return dict(data)
+        return {
+            k: round(round(v / self.step) * self.step, 10)
+            if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+            for k, v in data.items()
+        }
+
+    @staticmethod
+    def key(model: str, version, data: dict, *context):
+        return (model, version, *context, tuple(sorted(data.items())))
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop everything (model artifacts were reloaded)"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "step": self.step,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,284 @@
+"""
+Catalog query helpers shared by the earthquake endpoints
+Filter SQL, keyset cursors, the cheap-count strategy and rollup-backed aggregates
+"""
+import base64
+import json
+import math
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+# Width of the magnitude buckets in sismicity_daily_counts (std_sismicity.mag is DECIMAL(3,1))
+MAG_BUCKET = 0.1
+
+# days_back cutoff and the end of the (partial) UTC day it falls in.
+# Counters and rollups are keyed by UTC day, so a window is answered as
+# "whole days after the cutoff day" plus a live scan of the cutoff day itself.
+CUTOFF_SQL = "(NOW() - INTERVAL '%s days')"
+CUTOFF_DAY_SQL = f"({CUTOFF_SQL} AT TIME ZONE 'UTC')::date"
+CUTOFF_DAY_END_SQL = f"({CUTOFF_DAY_SQL} + 1)::timestamp AT TIME ZONE 'UTC'"
+
+# std_sismicity.grid_cell: 1-degree cells, FLOOR(lat + 90) * 360 + FLOOR(lon + 180)
+GRID_CELL_DEG = 1.0
+# Above this many cells the viewport covers most of the catalog and the
+# cell list costs more than it saves
+MAX_GRID_CELLS = 2000
+EARTH_RADIUS_KM = 6371.0
+
+
+# ══════════════════════════════════════════════════════════════════════
+#  FILTERS
+# ══════════════════════════════════════════════════════════════════════
+def grid_cells(min_lat, min_lon, max_lat, max_lon):
+    """Grid cell ids overlapping a bounding box, or None if there are too many to list"""
+    lat0, lat1 = math.floor(min_lat + 90), math.floor(max_lat + 90)
+    lon0, lon1 = math.floor(min_lon + 180), math.floor(max_lon + 180)
+    if (lat1 - lat0 + 1) * (lon1 - lon0 + 1) > MAX_GRID_CELLS:
+        return None
+    return [row * 360 + col for row in range(lat0, lat1 + 1) for col in range(lon0, lon1 + 1)]
+
+
+def radius_bbox(lat, lon, radius_km):
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) around a circle, on the same sphere as the haversine"""
+    angle = radius_km / EARTH_RADIUS_KM
+    dlat = math.degrees(angle)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90:
+        # Circle covers a pole: every longitude
+        return max(-90.0, min_lat), -180.0, min(90.0, max_lat), 180.0
+    # Widest longitude extent of a spherical cap (it lies poleward of the centre)
+    dlon = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(lat)))))
+    if lon - dlon < -180 or lon + dlon > 180:
+        # Circle wraps the antimeridian: fall back to the full longitude band
+        return min_lat, -180.0, max_lat, 180.0
+    return min_lat, lon - dlon, max_lat, lon + dlon
+
+
+def parse_polygon(text: str):
+    """'lat,lon;lat,lon;...' -> [(lat, lon), ...]"""
+    try:
+        points = [tuple(float(v) for v in pair.split(',')) for pair in text.strip().strip(';').split(';')]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="polygon must be 'lat,lon;lat,lon;...'")
+    if len(points) < 3 or any(len(p) != 2 for p in points):
+        raise HTTPException(status_code=400, detail="polygon needs at least 3 'lat,lon' vertices")
+    if any(not (-90 <= la <= 90 and -180 <= lo <= 180) for la, lo in points):
+        raise HTTPException(status_code=400, detail="polygon vertex out of range")
+    return points
+
+
+def earthquake_filter_params(
+    min_mag: Optional[float] = None,
+    max_mag: Optional[float] = None,
+    days_back: Optional[int] = None,
+    is_major: Optional[bool] = None,
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Radius filter centre"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Radius filter centre"),
+    radius_km: Optional[float] = Query(None, gt=0, le=20000),
+    polygon: Optional[str] = Query(None, description="'lat,lon;lat,lon;...' (at least 3 vertices)")
+) -> dict:
+    """Query parameters shared by the catalog endpoints (use with Depends) -> filters dict"""
+    filters = {'min_mag': min_mag, 'max_mag': max_mag, 'days_back': days_back, 'is_major': is_major,
+               'bbox': None, 'near': None, 'polygon': None}
+
+    bbox = (min_lat, min_lon, max_lat, max_lon)
+    if any(v is not None for v in bbox):
+        if any(v is None for v in bbox):
+            raise HTTPException(status_code=400, detail="Bounding box needs min_lat, max_lat, min_lon and max_lon")
+        if min_lat > max_lat or min_lon > max_lon:
+            raise HTTPException(status_code=400, detail="Bounding box minimums must not exceed maximums")
+        filters['bbox'] = bbox
+
+    near = (lat, lon, radius_km)
+    if any(v is not None for v in near):
+        if any(v is None for v in near):
+            raise HTTPException(status_code=400, detail="Radius filter needs lat, lon and radius_km")
+        filters['near'] = near
+
+    if polygon:
+        filters['polygon'] = parse_polygon(polygon)
+    return filters
+
+
+def _spatial_clause(min_lat, min_lon, max_lat, max_lon):
+    """Index-friendly prefilter: grid cells plus plain lat/lon ranges"""
+    clause = " AND lat BETWEEN %s AND %s AND lon BETWEEN %s AND %s"
+    params = [min_lat, max_lat, min_lon, max_lon]
+    cells = grid_cells(min_lat, min_lon, max_lat, max_lon)
+    if cells is not None:
+        clause = " AND grid_cell = ANY(%s)" + clause
+        params.insert(0, cells)
+    return clause, params
+
+
+def build_earthquake_filters(min_mag=None, max_mag=None, days_back=None, is_major=None,
+                             bbox=None, near=None, polygon=None):
+    """Shared WHERE clause for the catalog endpoints -> (sql, params)"""
+    clause = " WHERE 1=1"
+    params = []
+    if min_mag is not None:
+        clause += " AND mag >= %s"
+        params.append(min_mag)
+    if max_mag is not None:
+        clause += " AND mag <= %s"
+        params.append(max_mag)
+    if days_back is not None:
+        clause += " AND dt >= NOW() - INTERVAL '%s days'"
+        params.append(days_back)
+    if is_major is not None:
+        # std_sismicity.is_major is INTEGER (0/1)
+        clause += " AND is_major = %s"
+        params.append(int(is_major))
+
+    if bbox is not None:
+        sql, p = _spatial_clause(*bbox)
+        clause += sql
+        params.extend(p)
+    if near is not None:
+        c_lat, c_lon, radius_km = near
+        sql, p = _spatial_clause(*radius_bbox(c_lat, c_lon, radius_km))
+        clause += sql + """ AND %s * 2 * ASIN(LEAST(1, SQRT(
+            POWER(SIN(RADIANS(lat - %s) / 2), 2)
+            + COS(RADIANS(%s)) * COS(RADIANS(lat)) * POWER(SIN(RADIANS(lon - %s) / 2), 2)
+        ))) <= %s"""
+        params.extend(p + [EARTH_RADIUS_KM, c_lat, c_lat, c_lon, radius_km])
+    if polygon is not None:
+        lats = [p[0] for p in polygon]
+        lons = [p[1] for p in polygon]
+        sql, p = _spatial_clause(min(lats), min(lons), max(lats), max(lons))
+        # Built-in geometric types: x = lon, y = lat
+        clause += sql + " AND %s::polygon @> point(lon::float8, lat::float8)"
+        params.extend(p + ['(' + ','.join(f'({lo},{la})' for la, lo in polygon) + ')'])
+    return clause, params
+
+
+def encode_cursor(row: dict) -> str:
+    """Opaque keyset cursor pointing just past `row` in (dt DESC, id DESC) order"""
+    raw = json.dumps({"dt": row['dt'].isoformat(), "id": row['id']})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token: str):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(data['dt']), int(data['id'])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# ══════════════════════════════════════════════════════════════════════
+#  COUNT STRATEGY
+# ══════════════════════════════════════════════════════════════════════
+def _on_bucket_edge(value) -> bool:
+    if value is None:
+        return True
+    steps = value / MAG_BUCKET
+    return abs(steps - round(steps)) < 1e-9
+
+
+def counters_can_answer(filters: dict) -> bool:
+    """True when every active filter maps onto whole sismicity_daily_counts buckets"""
+    supported = {'min_mag', 'max_mag', 'days_back', 'is_major'}
+    active = {k for k, v in filters.items() if v is not None}
+    return (
+        active <= supported
+        and _on_bucket_edge(filters.get('min_mag'))
+        and _on_bucket_edge(filters.get('max_mag'))
+    )
+
+
+def count_from_counters(cursor, filters: dict) -> int:
+    """
+    Exact count from the per-day / per-magnitude-bucket counters.
+
+    days_back cuts mid-day, so whole days come from the counters and only the
+    partial first day is counted live (a short range scan on the dt index).
+    """
+    bucket_sql, params = "", []
+    live_sql, live_params = "", []
+    if filters.get('min_mag') is not None:
+        bucket_sql += " AND mag_bucket >= %s"
+        live_sql += " AND mag >= %s"
+        params.append(filters['min_mag'])
+        live_params.append(filters['min_mag'])
+    if filters.get('max_mag') is not None:
+        bucket_sql += " AND mag_bucket <= %s"
+        live_sql += " AND mag <= %s"
+        params.append(filters['max_mag'])
+        live_params.append(filters['max_mag'])
+    if filters.get('is_major') is not None:
+        bucket_sql += " AND is_major = %s"
+        live_sql += " AND is_major = %s"
+        # BOOLEAN in the counters table, INTEGER (0/1) in std_sismicity
+        params.append(bool(filters['is_major']))
+        live_params.append(int(filters['is_major']))
+
+    days_back = filters.get('days_back')
+    if days_back is None:
+        cursor.execute(
+            "SELECT COALESCE(SUM(event_count), 0) AS n FROM sismicity_daily_counts WHERE 1=1" + bucket_sql,
+            params
+        )
+        return int(cursor.fetchone()['n'])
+
+    cursor.execute(f"""
+        SELECT
+            (SELECT COALESCE(SUM(event_count), 0) FROM sismicity_daily_counts
+             WHERE day > {CUTOFF_DAY_SQL}{bucket_sql})
+          + (SELECT COUNT(*) FROM std_sismicity
+             WHERE dt >= {CUTOFF_SQL} AND dt < {CUTOFF_DAY_END_SQL}{live_sql}) AS n
+    """, [days_back, *params, days_back, days_back, *live_params])
+    return int(cursor.fetchone()['n'])
+
+
+def estimate_count(cursor, where: str, params: list) -> int:
+    """Planner row estimate for the filtered catalog (no table scan)"""
+    cursor.execute("EXPLAIN (FORMAT JSON) SELECT 1 FROM std_sismicity" + where, params)
+    plan = cursor.fetchone()['QUERY PLAN']
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_earthquakes(cursor, filters: dict, mode: str = "fast"):
+    """-> (count, count_is_estimate)"""
+    where, params = build_earthquake_filters(**filters)
+    if mode == "exact":
+        cursor.execute("SELECT COUNT(*) FROM std_sismicity" + where, params)
+        return cursor.fetchone()['count'], False
+    if counters_can_answer(filters):
+        return count_from_counters(cursor, filters), False
+    return estimate_count(cursor, where, params), True
+
+
+# ══════════════════════════════════════════════════════════════════════
+#  ROLLUPS
+# ══════════════════════════════════════════════════════════════════════
+ROLLUP_COLUMNS = "day, mag_class, event_count, mag_sum, mag_min, mag_max, depth_sum, dt_min, dt_max"
+
+
+def daily_rollup_sql(days_back=None):
+    """
+    Rows shaped like sismicity_daily_rollup covering the requested window
+    -> (sql, params). Use it as a CTE and re-aggregate on top.
+    """
+    if not days_back:
+        return f"SELECT {ROLLUP_COLUMNS} FROM sismicity_daily_rollup", []
+    sql = f"""
+        SELECT {ROLLUP_COLUMNS} FROM sismicity_daily_rollup
+        WHERE day > {CUTOFF_DAY_SQL}
+        UNION ALL
+        SELECT (dt AT TIME ZONE 'UTC')::date, sismicity_mag_class(mag),
+               COUNT(*), SUM(mag), MIN(mag), MAX(mag), SUM(depth), MIN(dt), MAX(dt)
+        FROM std_sismicity
+        WHERE dt >= {CUTOFF_SQL} AND dt < {CUTOFF_DAY_END_SQL}
+        GROUP BY 1, 2
+    """
+    return sql, [days_back, days_back, days_back]
@@ -0,0 +1,159 @@
+"""
+Shared PostgreSQL connection pool for the SeismoIQ backend
+Blocking psycopg2 work runs on a bounded thread pool so async handlers never stall the event loop
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extras import RealDictCursor
+
+
+class PoolMetrics:
+    """Running totals for connection wait and borrow times (milliseconds)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.borrows = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.borrow_total_ms = 0.0
+        self.borrow_max_ms = 0.0
+
+    def record_acquire(self, wait_ms: float):
+        with self._lock:
+            self.borrows += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def record_release(self, borrow_ms: float):
+        with self._lock:
+            self.in_use -= 1
+            self.borrow_total_ms += borrow_ms
+            self.borrow_max_ms = max(self.borrow_max_ms, borrow_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            n = max(self.borrows, 1)
+            return {
+                "borrows": self.borrows,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "wait_avg_ms": round(self.wait_total_ms / n, 3),
+                "wait_max_ms": round(self.wait_max_ms, 3),
+                "borrow_avg_ms": round(self.borrow_total_ms / n, 3),
+                "borrow_max_ms": round(self.borrow_max_ms, 3),
+            }
+
+
+class DatabasePool:
+    """
+    Fixed-size psycopg2 pool paired with an executor of the same size.
+
+    Callers queue on an asyncio semaphore before touching the executor, so a
+    job only ever reaches a worker thread once a connection is guaranteed to
+    be free. The time spent on that semaphore is the reported pool wait.
+    """
+
+    def __init__(self, db_config: dict, minconn: int = 1, maxconn: int = 10):
+        self.db_config = db_config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.metrics = PoolMetrics()
+        self._pool = None
+        self._executor = None
+        self._slots = None
+
+    def open(self):
+        if self._pool is None:
+            self._pool = ThreadedConnectionPool(
+                self.minconn, self.maxconn, cursor_factory=RealDictCursor, **self.db_config
+            )
+            self._executor = ThreadPoolExecutor(max_workers=self.maxconn, thread_name_prefix="db")
+            self._slots = asyncio.Semaphore(self.maxconn)
+            print(f"Database pool opened ({self.minconn}-{self.maxconn} connections)")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+
+    def _getconn(self):
+        return self._pool.getconn(), time.perf_counter()
+
+    def _putconn(self, conn, borrowed_at: float):
+        try:
+            # Never hand a connection with an open transaction to the next borrower
+            if not conn.closed:
+                conn.rollback()
+            self._pool.putconn(conn, close=bool(conn.closed))
+        finally:
+            self.metrics.record_release((time.perf_counter() - borrowed_at) * 1000)
+
+    async def _acquire_slot(self):
+        if self._pool is None:
+            self.open()
+        start = time.perf_counter()
+        await self._slots.acquire()
+        return (time.perf_counter() - start) * 1000
+
+    async def call(self, fn, *args):
+        """Run a blocking callable on the database executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def run(self, fn, *args):
+        """Borrow a connection, run fn(conn, *args) off the event loop, return its result"""
+        wait_ms = await self._acquire_slot()
+
+        def job():
+            conn, borrowed_at = self._getconn()
+            self.metrics.record_acquire(wait_ms)
+            try:
+                return fn(conn, *args)
+            finally:
+                self._putconn(conn, borrowed_at)
+
+        try:
+            return await self.call(job)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def session(self):
+        """Hold one connection across several awaits (e.g. streaming responses)"""
+        wait_ms = await self._acquire_slot()
+        try:
+            loop = asyncio.get_running_loop()
+            pending = loop.run_in_executor(self._executor, self._getconn)
+            try:
+                conn, borrowed_at = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # The worker may still hand us a connection; return it once it does
+                def give_back(f):
+                    if not f.cancelled() and f.exception() is None:
+                        self.metrics.record_acquire(wait_ms)
+                        self._executor.submit(self._putconn, *f.result())
+                pending.add_done_callback(give_back)
+                raise
+            self.metrics.record_acquire(wait_ms)
+            try:
+                yield conn
+            finally:
+                # Shielded so a client disconnect cannot leak the connection
+                await asyncio.shield(self.call(self._putconn, conn, borrowed_at))
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {"min": self.minconn, "max": self.maxconn, **self.metrics.snapshot()}
@@ -0,0 +1,280 @@
+"""
+Bulk export encoders for catalog rows
+Each encoder turns one fetched chunk of rows into bytes, so exports stream in constant memory
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "arrow": ARROW_MEDIA_TYPE,
+    "parquet": PARQUET_MEDIA_TYPE,
+}
+
+# Accept header values -> columnar format. Only the Arrow IPC *stream* format is
+# served; application/vnd.apache.arrow.file is deliberately absent (it falls through to JSON)
+COLUMNAR_ACCEPT = {
+    ARROW_MEDIA_TYPE: "arrow",
+    PARQUET_MEDIA_TYPE: "parquet",
+    "application/x-parquet": "parquet",
+}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+# ══════════════════════════════════════════════════════════════════════
+#  TEXT ENCODERS
+# ══════════════════════════════════════════════════════════════════════
+class CsvEncoder:
+    def __init__(self, columns):
+        self.columns = columns
+        self._header = True
+
+    def encode(self, rows) -> bytes:
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if self._header:
+            writer.writerow(self.columns)
+            self._header = False
+        for row in rows:
+            writer.writerow([
+                row[c].isoformat() if isinstance(row[c], (datetime, date)) else row[c]
+                for c in self.columns
+            ])
+        return buf.getvalue().encode()
+
+    def finish(self) -> bytes:
+        return self.encode([]) if self._header else b''
+
+
+class NdjsonEncoder:
+    def __init__(self, columns):
+        self.columns = columns
+
+    def encode(self, rows) -> bytes:
+        return ''.join(json.dumps(dict(row), default=_json_default) + '\n' for row in rows).encode()
+
+    def finish(self) -> bytes:
+        return b''
+
+
+# ══════════════════════════════════════════════════════════════════════
+#  COLUMNAR ENCODERS (optional: pyarrow)
+# ══════════════════════════════════════════════════════════════════════
+# Postgres type OID (cursor.description type_code) -> Arrow type, for columns not named below
+PG_ARROW_TYPES = {
+    16: 'bool_',          # boolean
+    20: 'int64',          # bigint
+    21: 'int32',          # smallint
+    23: 'int32',          # integer
+    700: 'float32',       # real
+    701: 'float64',       # double precision
+    1700: 'float32',      # numeric: magnitudes, depths and derived features
+    25: 'string',         # text
+    1042: 'string',       # char(n)
+    1043: 'string',       # varchar
+    1082: 'date32',       # date
+    1114: 'timestamp',    # timestamp
+    1184: 'timestamptz',  # timestamptz
+}
+
+
+def _pg_arrow_type(type_code):
+    name = PG_ARROW_TYPES.get(type_code)
+    if name is None:
+        return None
+    if name == 'timestamptz':
+        return pa.timestamp('us', tz='UTC')
+    if name == 'timestamp':
+        return pa.timestamp('us')
+    return getattr(pa, name)()
+
+
+def _arrow_type(column: str):
+    """Compact, typed columns for the std_sismicity fields clients actually read"""
+    if column in ('dt', 'updated'):
+        return pa.timestamp('us', tz='UTC')
+    if column in ('lat', 'lon'):
+        return pa.float64()
+    if column in ('id', 'seq', 'change_seq'):
+        return pa.int64()
+    if column in ('year', 'rolling_count_7d', 'rolling_count_30d', 'grid_cell'):
+        return pa.int32()
+    if column == 'is_major':
+        return pa.bool_()
+    if column in ('place', 'source', 'event_id'):
+        return pa.string()
+    return None
+
+
+def _column_values(rows, column, arrow_type):
+    values = [row[column] for row in rows]
+    if arrow_type is not None and pa.types.is_boolean(arrow_type):
+        return [None if v is None else bool(v) for v in values]
+    if arrow_type is None or pa.types.is_floating(arrow_type):
+        return [float(v) if isinstance(v, Decimal) else v for v in values]
+    return values
+
+
+class _ColumnarEncoder:
+    """
+    The schema is fixed before the first batch: by column name, else by the
+    Postgres type in `type_codes` (from cursor.description). Without type
+    codes, a column is inferred from the first chunk and raises ValueError if
+    that chunk holds no value for it, rather than guessing a type a later
+    chunk may not fit.
+    """
+
+    def __init__(self, columns, type_codes=None):
+        if pa is None:
+            raise RuntimeError("pyarrow is not installed")
+        self.columns = columns
+        self.types = [_arrow_type(c) for c in columns]
+        for i, type_code in enumerate(type_codes or []):
+            if self.types[i] is None:
+                self.types[i] = _pg_arrow_type(type_code)
+                if self.types[i] is None:
+                    raise ValueError(f"no Arrow type for column {columns[i]!r} (Postgres type {type_code})")
+        self.schema = None
+
+    def _batch(self, rows):
+        arrays, fields = [], []
+        for column, known in zip(self.columns, self.types):
+            if self.schema is not None:
+                arrow_type = self.schema.field(column).type
+            elif known is not None:
+                arrow_type = known
+            else:
+                sample = next((r[column] for r in rows if r[column] is not None), None)
+                if sample is None:
+                    raise ValueError(f"can't infer an Arrow type for all-NULL column {column!r}")
+                # Remaining catalog columns are magnitudes, depths and derived features
+                arrow_type = pa.float32() if isinstance(sample, (Decimal, float, int)) else None
+            array = pa.array(_column_values(rows, column, arrow_type), type=arrow_type)
+            arrays.append(array)
+            fields.append(pa.field(column, array.type))
+        if self.schema is None:
+            self.schema = pa.schema(fields)
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands its bytes back on drain() but keeps tell() monotonic"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ArrowStreamEncoder(_ColumnarEncoder):
+    def __init__(self, columns, type_codes=None):
+        super().__init__(columns, type_codes)
+        self._sink = _Sink()
+        self._writer = None
+
+    def encode(self, rows) -> bytes:
+        batch = self._batch(rows)
+        if self._writer is None:
+            self._writer = pa.ipc.new_stream(pa.PythonFile(self._sink, mode='w'), batch.schema)
+        if batch.num_rows:
+            self._writer.write_batch(batch)
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        if self._writer is None:
+            self.encode([])
+        self._writer.close()
+        return self._sink.drain()
+
+
+class ParquetEncoder(_ColumnarEncoder):
+    def __init__(self, columns, type_codes=None):
+        super().__init__(columns, type_codes)
+        self._sink = _Sink()
+        self._writer = None
+
+    def encode(self, rows) -> bytes:
+        batch = self._batch(rows)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(pa.PythonFile(self._sink, mode='w'), batch.schema, compression='zstd')
+        if batch.num_rows:
+            # One row group per fetched chunk
+            self._writer.write_batch(batch)
+        return self._sink.drain()
+
+    def finish(self) -> bytes:
+        if self._writer is None:
+            self.encode([])
+        self._writer.close()
+        return self._sink.drain()
+
+
+ENCODERS = {
+    "csv": CsvEncoder,
+    "ndjson": NdjsonEncoder,
+    "arrow": ArrowStreamEncoder,
+    "parquet": ParquetEncoder,
+}
+
+
+def columnar_available() -> bool:
+    return pa is not None
+
+
+def negotiate_columnar(accept: str):
+    """Columnar format named by an Accept header, or None for the default JSON"""
+    for part in (accept or '').split(','):
+        media_type = part.split(';')[0].strip().lower()
+        if media_type in COLUMNAR_ACCEPT:
+            return COLUMNAR_ACCEPT[media_type]
+    return None
+
+
+def make_encoder(fmt: str, description):
+    """Encoder for a cursor's columns; columnar formats take their types from the Postgres metadata"""
+    columns = [col.name for col in description]
+    if fmt in ("arrow", "parquet"):
+        return ENCODERS[fmt](columns, [col.type_code for col in description])
+    return ENCODERS[fmt](columns)
+
+
+def encode_all(fmt: str, description, rows) -> bytes:
+    encoder = make_encoder(fmt, description)
+    return encoder.encode(rows) + encoder.finish()
@@ -0,0 +1,217 @@
+"""
+Low-latency single-row inference path for the SeismoIQ models
+FeatureAssembler writes the model inputs straight into a reusable NumPy buffer
+(no DataFrame), and FusedModel folds the RobustScaler into a compiled copy of
+the tree ensemble so one call does scale + predict on a plain row
+"""
+import json
+import threading
+from datetime import datetime
+
+import numpy as np
+
+# Request fields and their defaults (same as build_features in main.py)
+FEATURE_INPUTS = {
+    'depth': 10,
+    'lat': 0,
+    'lon': 0,
+    'rolling_count_7d': 10,
+    'rolling_count_30d': 50,
+    'rolling_mean_mag_30d': 4.5,
+    'days_since_last_major': 30,
+}
+
+# Every column build_features can produce, in the order _compute() fills them
+FEATURE_COLUMNS = [
+    'depth', 'lat', 'lon', 'rolling_count_7d', 'rolling_count_30d', 'rolling_mean_mag_30d',
+    'month_sin', 'month_cos', 'hour_sin', 'hour_cos',
+    'depth_squared', 'depth_cubed', 'mag_depth_interaction',
+    'lat_lon_interaction', 'lat_depth_interaction',
+    'activity_ratio_7_30', 'recent_activity_score',
+    'days_since_last_major', 'days_since_last_major_log', 'recency_score',
+    'geo_cluster', 'is_weekend', 'day_of_year', 'quarter',
+]
+
+
+def _compute(data: dict, now: datetime):
+    depth = float(data.get('depth', FEATURE_INPUTS['depth']))
+    lat = float(data.get('lat', FEATURE_INPUTS['lat']))
+    lon = float(data.get('lon', FEATURE_INPUTS['lon']))
+    r7 = float(data.get('rolling_count_7d', FEATURE_INPUTS['rolling_count_7d']))
+    r30 = float(data.get('rolling_count_30d', FEATURE_INPUTS['rolling_count_30d']))
+    rm = float(data.get('rolling_mean_mag_30d', FEATURE_INPUTS['rolling_mean_mag_30d']))
+    dslm = float(data.get('days_since_last_major', FEATURE_INPUTS['days_since_last_major']))
+    return (
+        depth, lat, lon, r7, r30, rm,
+        0.5, 0.5, 0.0, 1.0,
+        depth ** 2, depth ** 3, 0.0,
+        lat * lon, lat * depth,
+        r7 / (r30 + 1), r7 * rm,
+        dslm, float(np.log1p(dslm)), 1 / (dslm + 1),
+        0.0, 0.0, now.timetuple().tm_yday, (now.month - 1) // 3 + 1,
+    )
+
+
+class FeatureAssembler:
+    """
+    Fills a (1, n_features) buffer in a model's saved feature order.
+
+    The column mapping is resolved once at construction; features the builder
+    does not produce read from a constant zero slot (the old fillna(0)).
+    Buffers are per thread, so concurrent callers never share one.
+    """
+
+    def __init__(self, feature_names):
+        self.feature_names = list(feature_names)
+        zero_slot = len(FEATURE_COLUMNS)
+        position = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+        self._take = np.array([position.get(name, zero_slot) for name in self.feature_names], dtype=np.intp)
+        self._local = threading.local()
+
+    def _buffers(self):
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = (np.zeros(len(FEATURE_COLUMNS) + 1), np.empty((1, len(self.feature_names))))
+            self._local.buffers = buffers
+        return buffers
+
+    def assemble(self, data: dict, now: datetime = None) -> np.ndarray:
+        """Model-ordered feature row for one request (the returned buffer is reused)"""
+        source, row = self._buffers()
+        source[:-1] = _compute(data, now or datetime.now())
+        np.take(source, self._take, out=row[0])
+        return row
+
+    def assemble_many(self, items, now: datetime = None) -> np.ndarray:
+        """(len(items), n_features) matrix for a micro-batch (a fresh array, not the shared buffer)"""
+        now = now or datetime.now()
+        source = np.zeros((len(items), len(FEATURE_COLUMNS) + 1))
+        for i, data in enumerate(items):
+            source[i, :-1] = _compute(data, now)
+        return source[:, self._take]
+
+
+# ══════════════════════════════════════════════════════════════════════
+#  COMPILED TREE ENSEMBLES
+# ══════════════════════════════════════════════════════════════════════
+def _compile_forest(model, proba: bool):
+    """sklearn forest -> per-tree (left, right, feature, threshold, leaf value) lists"""
+    trees = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        if proba:
+            value = tree.value[:, 0, :]
+            leaf = (value[:, 1] / value.sum(axis=1)).tolist()
+        else:
+            leaf = tree.value[:, 0, 0].tolist()
+        trees.append((tree.children_left.tolist(), tree.children_right.tolist(),
+                      tree.feature.tolist(), tree.threshold.tolist(), leaf))
+
+    def predict(row):
+        total = 0.0
+        for left, right, feature, threshold, leaf in trees:
+            node = 0
+            while left[node] != -1:
+                node = left[node] if row[feature[node]] <= threshold[node] else right[node]
+            total += leaf[node]
+        return total / len(trees)
+
+    return predict
+
+
+def _compile_xgboost(model, feature_names):
+    """XGBoost gbtree regressor (squared error) -> base score + per-tree node lists"""
+    booster = model.get_booster()
+    config = json.loads(booster.save_config())['learner']
+    if config['gradient_booster']['name'] != 'gbtree' or config['objective']['name'] != 'reg:squarederror':
+        return None
+    base_score = float(str(config['learner_model_param']['base_score']).strip('[]'))
+    columns = {name: i for i, name in enumerate(booster.feature_names or feature_names)}
+
+    trees = []
+    for dump in booster.get_dump(dump_format='json'):
+        nodes, stack = {}, [json.loads(dump)]
+        while stack:
+            node = stack.pop()
+            nodes[node['nodeid']] = node
+            stack.extend(node.get('children', []))
+        size = max(nodes) + 1
+        yes, no, feature, threshold, leaf = [-1] * size, [-1] * size, [0] * size, [0.0] * size, [0.0] * size
+        for i, node in nodes.items():
+            if 'leaf' in node:
+                leaf[i] = node['leaf']
+            else:
+                split = node['split']
+                yes[i], no[i] = node['yes'], node['no']
+                feature[i] = columns[split] if split in columns else int(split[1:])
+                threshold[i] = node['split_condition']
+        # XGBoost compares in float32; round the thresholds the same way
+        trees.append((yes, no, feature, np.float32(threshold).tolist(), leaf))
+
+    def predict(row):
+        total = base_score
+        for yes, no, feature, threshold, leaf in trees:
+            node = 0
+            while yes[node] != -1:
+                node = yes[node] if row[feature[node]] < threshold[node] else no[node]
+            total += leaf[node]
+        return total
+
+    return predict
+
+
+class FusedModel:
+    """
+    scaler.transform + model.predict (or predict_proba[:, 1]) as one callable on a single row.
+
+    RobustScaler is applied as (x - center) * inv_scale with precomputed arrays.
+    Random forests and squared-error XGBoost models are compiled to plain tree
+    walks (no per-call validation or thread fan-out); anything else falls back
+    to the estimator's own predict on the scaled row.
+    """
+
+    def __init__(self, scaler, model, feature_names, proba: bool = False):
+        n = len(feature_names)
+        center = getattr(scaler, 'center_', None)
+        scale = getattr(scaler, 'scale_', None)
+        self._center = np.zeros(n) if center is None else np.asarray(center, dtype=np.float64)
+        self._inv_scale = np.ones(n) if scale is None else 1.0 / np.asarray(scale, dtype=np.float64)
+        self._scaled = threading.local()
+        self.model = model
+        self.proba = proba
+
+        # Up to this many rows the compiled walk beats the estimator's own
+        # vectorized predict (measured on the shipped models: sklearn forests
+        # pay ~0.1 ms per tree per call, XGBoost ~1 ms per call)
+        self.compiled_max_rows = 0
+        self._tree_predict = None
+        if hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+            if not proba or list(model.classes_) == [0, 1]:
+                self._tree_predict = _compile_forest(model, proba)
+                self.compiled_max_rows = 256
+        elif hasattr(model, 'get_booster') and not proba:
+            self._tree_predict = _compile_xgboost(model, feature_names)
+            self.compiled_max_rows = 2
+        self.compiled = self._tree_predict is not None
+
+    def __call__(self, row: np.ndarray) -> float:
+        scaled = getattr(self._scaled, 'buffer', None)
+        if scaled is None:
+            scaled = self._scaled.buffer = np.empty_like(self._center)
+        np.subtract(row.reshape(-1), self._center, out=scaled)
+        np.multiply(scaled, self._inv_scale, out=scaled)
+        if self._tree_predict is not None:
+            # Trees are fitted on float32 inputs
+            return float(self._tree_predict(scaled.astype(np.float32).tolist()))
+        if self.proba:
+            return float(self.model.predict_proba(scaled.reshape(1, -1))[0, 1])
+        return float(self.model.predict(scaled.reshape(1, -1))[0])
+
+    def predict_many(self, X: np.ndarray) -> list:
+        """Scale + predict for a (n, n_features) matrix -> list of floats"""
+        scaled = (X - self._center) * self._inv_scale
+        if self._tree_predict is not None and len(scaled) <= self.compiled_max_rows:
+            return [float(self._tree_predict(row)) for row in scaled.astype(np.float32).tolist()]
+        if self.proba:
+            return self.model.predict_proba(scaled)[:, 1].astype(float).tolist()
+        return self.model.predict(scaled).astype(float).tolist()
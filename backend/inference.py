@@ -0,0 +1,121 @@
+"""
+Dedicated worker pool for CPU-bound model work (sklearn / XGBoost / forecasting)
+Keeps inference off the event loop, bounds the backlog, and caps the threads
+each model may spin up so uvicorn workers x model threads never oversubscribe the CPU
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+
+def limit_model_threads(model, threads: int):
+    """Pin an estimator (and any nested estimators) to `threads` threads"""
+    if hasattr(model, 'get_booster'):
+        # XGBoost sklearn wrapper; the booster keeps its own nthread
+        model.set_params(n_jobs=threads)
+        try:
+            model.get_booster().set_param({'nthread': threads})
+        except Exception:
+            pass
+    elif hasattr(model, 'n_jobs'):
+        model.n_jobs = threads
+    for nested in getattr(model, 'estimators_', None) or []:
+        # Voting/stacking ensembles hold fitted sub-estimators; forests hold trees (no n_jobs)
+        if isinstance(nested, (list, tuple)):
+            nested = nested[-1]
+        if hasattr(nested, 'n_jobs') or hasattr(nested, 'get_booster'):
+            limit_model_threads(nested, threads)
+    return model
+
+
+class InferencePool:
+    """
+    Thread pool for model inference with a bounded queue.
+
+    Threads (not processes) because sklearn and XGBoost release the GIL while
+    predicting and the loaded models/forecaster are shared in memory; a process
+    pool would copy every model into every worker of every uvicorn process.
+    At most `workers` jobs run and `max_queue` wait; beyond that callers get a
+    503 straight away instead of piling up behind a slow model.
+    """
+
+    def __init__(self, workers: int = 2, max_queue: int = 64, model_threads: int = 1):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.model_threads = model_threads
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.run_total_ms = 0.0
+        self.run_max_ms = 0.0
+        self.wait_total_ms = 0.0
+
+    def open(self):
+        if self._executor is None:
+            if threadpool_limits is not None:
+                # BLAS / OpenMP pools inside numpy, sklearn and XGBoost
+                threadpool_limits(limits=self.model_threads)
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ml")
+            print(f"Inference pool opened ({self.workers} workers, queue {self.max_queue}, "
+                  f"{self.model_threads} thread(s) per model)")
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _job(self, fn, args, queued_at):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            run_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self.completed += 1
+                self.wait_total_ms += (started - queued_at) * 1000
+                self.run_total_ms += run_ms
+                self.run_max_ms = max(self.run_max_ms, run_ms)
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the inference pool; 503 if the queue is full"""
+        if self._executor is None:
+            self.open()
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Inference queue full, retry shortly",
+                                headers={"Retry-After": "1"})
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._job, fn, args, time.perf_counter())
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = max(self.completed, 1)
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "model_threads": self.model_threads,
+                "pending": self.pending,
+                "queued": max(0, self.pending - self.workers),
+                "peak_pending": self.peak_pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_avg_ms": round(self.wait_total_ms / n, 3),
+                "run_avg_ms": round(self.run_total_ms / n, 3),
+                "run_max_ms": round(self.run_max_ms, 3),
+            }
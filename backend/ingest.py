@@ -0,0 +1,131 @@
+"""
+Bulk, idempotent ingest of USGS GeoJSON events into std_sismicity
+Events are keyed by their USGS id: a whole feed lands in one batched upsert,
+and revised events (newer `updated`) overwrite the stored row instead of duplicating it
+"""
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
+
+MAJOR_MAG = 5.5
+INGEST_PAGE_SIZE = 1000
+
+# Column order of the tuples usgs_rows() builds
+INGEST_COLUMNS = ['event_id', 'updated', 'dt', 'mag', 'depth', 'lat', 'lon', 'place', 'is_major', 'source']
+
+# Rows loaded before event_id existed are matched once on their old natural key
+# and take over the USGS id, so the first upsert doesn't duplicate them
+ADOPT_LEGACY_SQL = """
+    UPDATE std_sismicity s
+    SET event_id = m.event_id
+    FROM (
+        SELECT DISTINCT ON (v.event_id) v.event_id, s.id
+        FROM (VALUES %s) AS v (event_id, dt, lat, lon, mag)
+        JOIN std_sismicity s
+          ON s.dt = v.dt AND s.lat = v.lat AND s.lon = v.lon AND s.mag = ROUND(v.mag, 1)
+        WHERE s.event_id IS NULL
+          AND NOT EXISTS (SELECT 1 FROM std_sismicity e WHERE e.event_id = v.event_id)
+        ORDER BY v.event_id, s.id
+    ) m
+    WHERE s.id = m.id
+"""
+ADOPT_TEMPLATE = "(%s, %s::timestamptz, %s::numeric, %s::numeric, %s::numeric)"
+
+# `previous` reads the pre-statement snapshot, so moved events report their old position too
+UPSERT_SQL = f"""
+    WITH incoming ({', '.join(INGEST_COLUMNS)}) AS (VALUES %s),
+    previous AS (
+        SELECT s.event_id, s.lat AS old_lat, s.lon AS old_lon
+        FROM std_sismicity s
+        JOIN incoming i USING (event_id)
+    ),
+    upserted AS (
+        INSERT INTO std_sismicity ({', '.join(INGEST_COLUMNS)})
+        SELECT {', '.join(INGEST_COLUMNS)} FROM incoming
+        ON CONFLICT (event_id) DO UPDATE SET
+            updated = EXCLUDED.updated,
+            dt = EXCLUDED.dt,
+            mag = EXCLUDED.mag,
+            depth = EXCLUDED.depth,
+            lat = EXCLUDED.lat,
+            lon = EXCLUDED.lon,
+            place = EXCLUDED.place,
+            is_major = EXCLUDED.is_major
+        WHERE std_sismicity.updated IS NULL OR EXCLUDED.updated > std_sismicity.updated
+        RETURNING id, event_id, dt, mag, depth, lat, lon, place, change_seq AS seq, (xmax = 0) AS inserted
+    )
+    SELECT u.*, p.old_lat, p.old_lon
+    FROM upserted u
+    LEFT JOIN previous p USING (event_id)
+"""
+UPSERT_TEMPLATE = "(%s, %s::timestamptz, %s::timestamptz, %s::numeric, %s::numeric, %s::numeric, %s::numeric, %s, %s, %s)"
+
+
+def usgs_rows(features: list, source: str = 'USGS'):
+    """GeoJSON features -> (upsert tuples, skipped); one tuple per event id, latest revision wins"""
+    latest = {}
+    skipped = 0
+    for feature in features:
+        props = feature.get('properties') or {}
+        coords = (feature.get('geometry') or {}).get('coordinates') or []
+        event_id = feature.get('id')
+        mag = props.get('mag')
+        if event_id is None or mag is None or len(coords) < 2 or props.get('time') is None:
+            skipped += 1
+            continue
+        updated_ms = props.get('updated') or props['time']
+        row = (
+            event_id,
+            datetime.fromtimestamp(updated_ms / 1000, tz=timezone.utc),
+            datetime.fromtimestamp(props['time'] / 1000, tz=timezone.utc),
+            mag,
+            coords[2] if len(coords) > 2 and coords[2] is not None else 0,
+            coords[1],
+            coords[0],
+            props.get('place') or 'Unknown',
+            int(mag >= MAJOR_MAG),
+            source,
+        )
+        previous = latest.get(event_id)
+        if previous is not None:
+            skipped += 1
+            if previous[1] >= row[1]:
+                continue
+        latest[event_id] = row
+    return list(latest.values()), skipped
+
+
+def upsert_events(conn, rows: list, page_size: int = INGEST_PAGE_SIZE) -> dict:
+    """
+    Adopt legacy rows, then upsert every row in pages of `page_size` (one
+    statement per page) and commit. Returns the inserted and revised events,
+    how many were unchanged, and every (lat, lon) whose map cell changed.
+    """
+    result = {"inserted": [], "revised": [], "unchanged": 0, "points": []}
+    if not rows:
+        return result
+
+    cursor = conn.cursor()
+    try:
+        execute_values(cursor, ADOPT_LEGACY_SQL, [(r[0], r[2], r[5], r[6], r[3]) for r in rows],
+                       template=ADOPT_TEMPLATE, page_size=page_size)
+        written = execute_values(cursor, UPSERT_SQL, rows, template=UPSERT_TEMPLATE,
+                                 page_size=page_size, fetch=True)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    for row in written:
+        event = {k: row[k] for k in ('id', 'event_id', 'dt', 'mag', 'depth', 'lat', 'lon', 'place', 'seq')}
+        for k in ('mag', 'depth', 'lat', 'lon'):
+            event[k] = float(event[k])
+        result["points"].append((event['lat'], event['lon']))
+        if row['inserted']:
+            result["inserted"].append(event)
+        else:
+            result["revised"].append(event)
+            if row['old_lat'] is not None:
+                result["points"].append((float(row['old_lat']), float(row['old_lon'])))
+    result["unchanged"] = len(rows) - len(written)
+    return result
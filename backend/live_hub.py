@@ -0,0 +1,319 @@
+"""
+Fan-out hub for the live earthquake feed
+Every connection gets a small bounded outbound queue and optional server-side
+filters; each published batch is filtered and JSON-encoded once per distinct
+filter and the same message is queued to every matching connection, whether it
+reads over a WebSocket or Server-Sent Events. Recent
+events stay in a ring buffer so reconnecting clients can resume by sequence number
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+
+# seq is the row's change_seq: global across processes and restarts, increasing per insert / revision
+LIVE_EVENT_FIELDS = ('id', 'event_id', 'dt', 'mag', 'depth', 'lat', 'lon', 'place', 'seq')
+
+
+def live_event(row: dict) -> dict:
+    """JSON-ready live-feed event from a catalog row / ingest result"""
+    event = {}
+    for field in LIVE_EVENT_FIELDS:
+        value = row.get(field)
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = float(value)
+        event[field] = value
+    if 'revised' in row:
+        event['revised'] = bool(row['revised'])
+    return event
+
+
+def batch_seq(events: list):
+    """Highest seq in a batch: what the client resumes from next time"""
+    return max((e['seq'] for e in events if e.get('seq') is not None), default=None)
+
+
+def encode(message: dict) -> str:
+    return json.dumps(message, separators=(',', ':'), default=str)
+
+
+class Outgoing:
+    """One encoded message, shared by every subscriber it is queued to; the SSE frame is built on first use"""
+    __slots__ = ('type', 'seq', 'text', '_frame')
+
+    def __init__(self, message: dict):
+        self.type = message.get('type')
+        self.seq = message.get('seq')
+        self.text = encode(message)
+        self._frame = None
+
+    def sse(self) -> str:
+        if self._frame is None:
+            # Compact JSON never contains a raw newline, so one data line is enough
+            head = f"id: {self.seq}\n" if self.seq is not None else ""
+            self._frame = f"{head}event: {self.type}\ndata: {self.text}\n\n"
+        return self._frame
+
+
+class LiveFilter:
+    """Minimum magnitude and/or bounding box (min_lat, min_lon, max_lat, max_lon); hashable so equal filters share payloads"""
+    __slots__ = ('min_mag', 'bbox')
+
+    def __init__(self, min_mag: float = None, bbox=None):
+        self.min_mag = None if min_mag is None else float(min_mag)
+        self.bbox = None if bbox is None else tuple(float(v) for v in bbox)
+        if self.bbox is not None and (len(self.bbox) != 4 or self.bbox[0] > self.bbox[2]):
+            raise ValueError("bbox must be min_lat,min_lon,max_lat,max_lon")
+
+    @classmethod
+    def parse(cls, min_mag=None, bbox=None):
+        """From query-string / JSON values (bbox as 'a,b,c,d' or a list)"""
+        if isinstance(bbox, str):
+            bbox = bbox.split(',') if bbox else None
+        return cls(min_mag, bbox)
+
+    def matches(self, event: dict) -> bool:
+        if self.min_mag is not None and (event.get('mag') is None or event['mag'] < self.min_mag):
+            return False
+        if self.bbox is not None:
+            lat, lon = event.get('lat'), event.get('lon')
+            if lat is None or lon is None:
+                return False
+            min_lat, min_lon, max_lat, max_lon = self.bbox
+            if not min_lat <= lat <= max_lat:
+                return False
+            # min_lon > max_lon means the box crosses the antimeridian
+            if min_lon <= max_lon:
+                return min_lon <= lon <= max_lon
+            return lon >= min_lon or lon <= max_lon
+        return True
+
+    def _key(self):
+        return (self.min_mag, self.bbox)
+
+    def __eq__(self, other):
+        return isinstance(other, LiveFilter) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def describe(self) -> dict:
+        return {"min_mag": self.min_mag, "bbox": list(self.bbox) if self.bbox else None}
+
+
+class Subscriber:
+    """
+    One live connection's outbound queue.
+
+    Event messages beyond `max_queue` drop the oldest queued one, and the
+    client gets a single {"type": "dropped", "count": n} notice before the
+    next message instead of one per loss. Keyed messages (pong, status)
+    replace a queued message with the same key instead of piling up.
+    """
+    __slots__ = ('id', 'filter', 'max_queue', '_queue', '_keys', '_wakeup', 'dropped',
+                 '_unreported', 'sent', 'last_seen', 'connected_at', 'closed', 'transport')
+
+    def __init__(self, sid: int, live_filter: LiveFilter, max_queue: int, transport: str):
+        self.id = sid
+        self.filter = live_filter
+        self.max_queue = max_queue
+        self._queue = deque()
+        self._keys = {}
+        self._wakeup = asyncio.Event()
+        self.dropped = 0
+        self._unreported = 0
+        self.sent = 0
+        self.last_seen = self.connected_at = time.monotonic()
+        self.closed = False
+        self.transport = transport
+
+    def offer(self, message: Outgoing, key: str = None):
+        if self.closed:
+            return
+        if key is not None and key in self._keys:
+            # Coalesce: keep the queue position, take the newest payload
+            entry = self._keys[key]
+            entry[1] = message
+            return
+        if len(self._queue) >= self.max_queue:
+            old_key, _ = self._queue.popleft()
+            if old_key is not None:
+                self._keys.pop(old_key, None)
+            self.dropped += 1
+            self._unreported += 1
+        entry = [key, message]
+        self._queue.append(entry)
+        if key is not None:
+            self._keys[key] = entry
+        self._wakeup.set()
+
+    async def get(self):
+        """Next Outgoing message, or None once the subscriber is closed"""
+        while not self._queue:
+            if self.closed:
+                return None
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        if self._unreported:
+            count, self._unreported = self._unreported, 0
+            return Outgoing({"type": "dropped", "count": count})
+        key, message = self._queue.popleft()
+        if key is not None:
+            self._keys.pop(key, None)
+        self.sent += 1
+        return message
+
+    def touch(self):
+        self.last_seen = time.monotonic()
+
+    def close(self):
+        self.closed = True
+        self._queue.clear()
+        self._keys.clear()
+        self._wakeup.set()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+
+class LiveHub:
+    """
+    Registry of live subscribers (WebSocket or SSE) with filtered fan-out.
+
+    publish_events() runs on the event loop and only appends to queues, so a
+    slow client can never hold up the others; each transport drains its own
+    subscriber with get(). Connections silent for `idle_timeout` seconds are
+    closed by sweep().
+
+    The last `history` sequenced events are kept for replay(). `floor` is the
+    highest seq the buffer can no longer vouch for (the newest evicted event,
+    or just below the first one seen); resuming from below it needs the database.
+    """
+
+    def __init__(self, max_queue: int = 256, idle_timeout: float = 120, history: int = 1000):
+        self.max_queue = max_queue
+        self.idle_timeout = idle_timeout
+        self.history = deque(maxlen=history)
+        self.floor = None
+        self.last_seq = None
+        self.subscribers = {}
+        self._ids = itertools.count(1)
+        self.published = 0
+        self.deliveries = 0
+        self.encodes = 0
+        self.evicted = 0
+        self.peak_subscribers = 0
+
+    def register(self, live_filter: LiveFilter = None, transport: str = "ws") -> Subscriber:
+        subscriber = Subscriber(next(self._ids), live_filter or LiveFilter(), self.max_queue, transport)
+        self.subscribers[subscriber.id] = subscriber
+        self.peak_subscribers = max(self.peak_subscribers, len(self.subscribers))
+        return subscriber
+
+    def unregister(self, subscriber: Subscriber):
+        subscriber.close()
+        self.subscribers.pop(subscriber.id, None)
+
+    def publish_events(self, events: list, message_type: str = "new_events") -> int:
+        """Queue `events` to every subscriber whose filter matches any of them -> deliveries"""
+        if not events:
+            return 0
+        self._remember(events)
+        if not self.subscribers:
+            return 0
+        self.published += len(events)
+        by_filter = {}
+        for subscriber in self.subscribers.values():
+            by_filter.setdefault(subscriber.filter, []).append(subscriber)
+
+        payloads = {}
+        delivered = 0
+        for live_filter, subscribers in by_filter.items():
+            matched = tuple(i for i, event in enumerate(events) if live_filter.matches(event))
+            if not matched:
+                continue
+            # Different filters often select the same events; encode each selection once
+            message = payloads.get(matched)
+            if message is None:
+                selected = [events[i] for i in matched]
+                message = payloads[matched] = Outgoing({"type": message_type, "seq": batch_seq(selected), "data": selected})
+                self.encodes += 1
+            for subscriber in subscribers:
+                subscriber.offer(message)
+            delivered += len(subscribers)
+        self.deliveries += delivered
+        return delivered
+
+    # ── resume ───────────────────────────────────────────────────────
+    def _remember(self, events: list):
+        for event in events:
+            seq = event.get('seq')
+            if seq is None:
+                continue
+            if self.floor is None:
+                self.floor = seq - 1
+            if len(self.history) == self.history.maxlen:
+                self.floor = max(self.floor, self.history[0]['seq'])
+            self.history.append(event)
+            self.last_seq = seq if self.last_seq is None else max(self.last_seq, seq)
+
+    def replay(self, after_seq: int, live_filter: LiveFilter = None):
+        """Buffered events with seq > after_seq matching the filter, oldest first; None if the buffer doesn't reach back that far"""
+        if self.floor is None or after_seq < self.floor:
+            return None
+        live_filter = live_filter or LiveFilter()
+        events = [e for e in self.history if e['seq'] > after_seq and live_filter.matches(e)]
+        # Concurrent writers can commit slightly out of seq order
+        events.sort(key=lambda e: e['seq'])
+        return events
+
+    def forget(self):
+        """Drop the replay buffer after changes it can't account for (bulk loads, listener reconnects)"""
+        self.history.clear()
+        self.floor = None
+
+    def send(self, subscriber: Subscriber, message: dict, key: str = None):
+        """Queue a message for one subscriber (pong, snapshot, ...)"""
+        subscriber.offer(Outgoing(message), key)
+
+    def sweep_idle(self) -> int:
+        cutoff = time.monotonic() - self.idle_timeout
+        idle = [s for s in self.subscribers.values() if s.last_seen < cutoff]
+        for subscriber in idle:
+            self.unregister(subscriber)
+        self.evicted += len(idle)
+        return len(idle)
+
+    async def sweep(self, interval: float = 15):
+        """Evict idle connections forever (run as a background task)"""
+        while True:
+            await asyncio.sleep(interval)
+            evicted = self.sweep_idle()
+            if evicted:
+                print(f"Live hub evicted {evicted} idle connection(s)")
+
+    def stats(self) -> dict:
+        subscribers = list(self.subscribers.values())
+        return {
+            "subscribers": len(subscribers),
+            "peak_subscribers": self.peak_subscribers,
+            "by_transport": {t: sum(1 for s in subscribers if s.transport == t)
+                             for t in {s.transport for s in subscribers}},
+            "distinct_filters": len({s.filter for s in subscribers}),
+            "queued": sum(s.queued for s in subscribers),
+            "max_queued": max((s.queued for s in subscribers), default=0),
+            "dropped": sum(s.dropped for s in subscribers),
+            "events_published": self.published,
+            "deliveries": self.deliveries,
+            "encodes": self.encodes,
+            "evicted_idle": self.evicted,
+            "history": len(self.history),
+            "replay_floor": self.floor,
+            "last_seq": self.last_seq,
+        }
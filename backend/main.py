@@ -2,23 +2,46 @@
 SeismoIQ FastAPI Backend
 Complete earthquake intelligence API with USGS live data fetching
 """
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query
+import time
+PROCESS_STARTED = time.perf_counter()  # taken before the heavy imports for the startup breakdown
+
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Depends, Header, Path
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response, JSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import pandas as pd
 import numpy as np
-import joblib
 import os
 import sys
 from datetime import datetime, timedelta
-from contextlib import contextmanager, asynccontextmanager
+from contextlib import asynccontextmanager
 import asyncio
 import json
-import requests
-from email_service import send_earthquake_alert, send_welcome_email_to_user
+import threading
+from database import DatabasePool
+from cache import ResponseCache, MemoryCacheBackend, RedisCacheBackend, PredictionCache
+from exporters import EXPORT_FORMATS, columnar_available, negotiate_columnar, make_encoder, encode_all
+from tiles import TileCache, MAX_TILE_ZOOM, tile_sql, tile_payload
+from features import FeatureAssembler, FusedModel
+from inference import InferencePool, limit_model_threads
+from batching import MicroBatcher
+from model_registry import ModelRegistry
+from risk_surface import RiskGrid, RiskSurface
+from ingest import usgs_rows, upsert_events
+from usgs_poller import AdvisoryLease, UsgsPoller, USGS_FDSN_URL
+from alert_matcher import AlertMatcher
+from live_hub import LiveHub, LiveFilter, live_event, batch_seq
+from pg_listener import PgListener, CATALOG_CHANNEL, ALERTS_CHANNEL, parse_catalog_notify
+from warmup import Readiness, READY, FAILED, DISABLED
+from catalog import (
+    build_earthquake_filters, earthquake_filter_params, count_earthquakes,
+    encode_cursor, decode_cursor, daily_rollup_sql
+)
+import httpx
+# SendGrid, the forecaster and the chatbot are imported where they are used
+
+IMPORTS_MS = (time.perf_counter() - PROCESS_STARTED) * 1000
 
 # ══════════════════════════════════════════════════════════════════════
 #  LOAD .ENV MANUALLY (most reliable on Windows)
@@ -48,38 +71,170 @@ DB_CONFIG = {
     'password': os.environ.get('DB_PASSWORD', 'bhupin85'),
 }
 
+DB_POOL_MIN = int(os.environ.get('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.environ.get('DB_POOL_MAX', 10))
+
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 2000))
+# Each running export holds a pool connection for the whole download; more are turned away with 429
+EXPORT_MAX_CONCURRENT = int(os.environ.get('EXPORT_MAX_CONCURRENT', 2))
+
+# Live feed fan-out: queued messages per connection before the oldest are dropped,
+# seconds without a client message (the frontend pings every 25 s) before eviction
+LIVE_QUEUE_MAX = int(os.environ.get('LIVE_QUEUE_MAX', 256))
+LIVE_IDLE_TIMEOUT = float(os.environ.get('LIVE_IDLE_TIMEOUT', 120))
+LIVE_SEND_TIMEOUT = float(os.environ.get('LIVE_SEND_TIMEOUT', 10))
+# Events kept in memory for resume_from; larger gaps are replayed from the database up to LIVE_REPLAY_MAX
+LIVE_HISTORY = int(os.environ.get('LIVE_HISTORY', 1000))
+LIVE_REPLAY_MAX = int(os.environ.get('LIVE_REPLAY_MAX', 1000))
+# change_seq is taken when a row is written, not when it commits: resume this many seqs early to catch
+# rows a concurrent writer committed late (clients drop the repeats by event_id + seq)
+LIVE_RESUME_MARGIN = int(os.environ.get('LIVE_RESUME_MARGIN', 100))
+LIVE_SSE_KEEPALIVE = float(os.environ.get('LIVE_SSE_KEEPALIVE', 15))  # seconds between SSE comment lines on a quiet feed
+# LISTEN for the std_sismicity / alert_subscriptions change triggers, so inserts from any
+# process reach live clients and every worker matches alerts against the same subscriptions
+DB_LISTEN = os.environ.get('DB_LISTEN', '1') != '0'
+
+INGEST_PAGE_SIZE = int(os.environ.get('INGEST_PAGE_SIZE', 1000))  # events per upsert statement
+
+# Background USGS poller (incremental via updatedafter); 0 disables it
+USGS_FDSN_URL = os.environ.get('USGS_FDSN_URL', USGS_FDSN_URL)
+USGS_POLL_INTERVAL = float(os.environ.get('USGS_POLL_INTERVAL', 60))
+USGS_POLL_MIN_MAG = float(os.environ.get('USGS_POLL_MIN_MAG', 2.5))
+USGS_POLL_LOOKBACK_HOURS = float(os.environ.get('USGS_POLL_LOOKBACK_HOURS', 24))  # first poll with an empty catalog
+USGS_POLL_MAX_BACKOFF = float(os.environ.get('USGS_POLL_MAX_BACKOFF', 900))
+USGS_TIMEOUT = float(os.environ.get('USGS_TIMEOUT', 30))
+# Elect one polling process per database through an advisory lock (0 = every process polls)
+USGS_POLL_ELECT = os.environ.get('USGS_POLL_ELECT', '1') != '0'
+
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 300))
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 512))
+RESPONSE_CACHE_URL = os.environ.get('RESPONSE_CACHE_URL')  # e.g. redis://localhost:6379/0 to share across workers
+
+TILE_CACHE_SIZE = int(os.environ.get('TILE_CACHE_SIZE', 4096))
+TILE_CACHE_TTL = float(os.environ.get('TILE_CACHE_TTL', 3600))
+
+PREDICT_BATCH_MAX = int(os.environ.get('PREDICT_BATCH_MAX', 1000))
+
+ML_WORKERS = int(os.environ.get('ML_WORKERS', 2))
+ML_QUEUE_MAX = int(os.environ.get('ML_QUEUE_MAX', 64))
+ML_MODEL_THREADS = int(os.environ.get('ML_MODEL_THREADS', 1))
+ML_BATCH_WINDOW_MS = float(os.environ.get('ML_BATCH_WINDOW_MS', 2))  # 0 disables micro-batching
+ML_BATCH_MAX = int(os.environ.get('ML_BATCH_MAX', 32))
+
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 4096))
+PREDICTION_CACHE_STEP = float(os.environ.get('PREDICTION_CACHE_STEP', 0.01))  # input grid; 0 = exact inputs
+
+ML_REGISTRY_POLL = float(os.environ.get('ML_REGISTRY_POLL', 30))  # seconds between checks for new model versions; 0 = off
+ML_LOAD_WORKERS = int(os.environ.get('ML_LOAD_WORKERS', 1))  # bundles unpickled side by side at startup / reload
+
+# Regional risk surface: min_lat,min_lon,max_lat,max_lon of the grid and its cell size in degrees
+RISK_GRID_BOUNDS = [float(v) for v in os.environ.get('RISK_GRID_BOUNDS', '5,60,40,100').split(',')]
+RISK_GRID_STEP = float(os.environ.get('RISK_GRID_STEP', 0.5))
+RISK_GRID_TTL = float(os.environ.get('RISK_GRID_TTL', 3600))  # full rebuild interval; ingests refresh touched cells
+RISK_GRID_LOOKBACK_DAYS = int(os.environ.get('RISK_GRID_LOOKBACK_DAYS', 365))
+
+WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP', '1') != '0'  # build forecaster + chatbot in the background
+
 ML_MODELS_PATH = os.getenv('ML_MODELS_PATH', r'C:\Users\bhupi\Sismicity\ml')
 sys.path.insert(0, ML_MODELS_PATH)
 
 # ══════════════════════════════════════════════════════════════════════
 #  ML MODELS - LOAD ON STARTUP
 # ══════════════════════════════════════════════════════════════════════
-ml_models = {}
+# Bundles each endpoint can serve (first available is the default) and
+# which of them output a major-event probability rather than a magnitude
+MAGNITUDE_BUNDLES = ('magnitude', 'magnitude_xgb')
+CLASSIFIER_BUNDLES = ('classifier', 'classifier_xgb')
+PROBA_BUNDLES = set(CLASSIFIER_BUNDLES)
+
+def prepare_bundle(bundle):
+    """Runs in the background loader before a bundle goes live"""
+    limit_model_threads(bundle.model, ML_MODEL_THREADS)
+    fused = FusedModel(bundle.scaler, bundle.model, bundle.features, proba=bundle.name in PROBA_BUNDLES)
+    bundle.extras['assembler'] = FeatureAssembler(bundle.features)
+    bundle.extras['fused'] = fused
+    bundle.extras['compiled'] = fused.compiled
+
+def on_models_swapped(names):
+    # Cache keys carry the version already; this just frees the dead entries
+    prediction_cache.clear()
+    readiness.mark("models", READY)
+
+model_registry = ModelRegistry(ML_MODELS_PATH, prepare=prepare_bundle, on_swap=on_models_swapped,
+                               load_workers=ML_LOAD_WORKERS)
 
 def load_ml_models():
-    global ml_models
-    files = {
-        'mag_model': 'magnitude_predictor.pkl',
-        'mag_scaler': 'magnitude_scaler.pkl',
-        'mag_features': 'magnitude_features.pkl',
-        'cls_model': 'major_event_classifier.pkl',
-        'cls_scaler': 'classifier_scaler.pkl',
-        'cls_features': 'classifier_features.pkl',
-    }
-    for key, fname in files.items():
-        path = os.path.join(ML_MODELS_PATH, fname)
-        if os.path.exists(path):
-            ml_models[key] = joblib.load(path)
-            print(f"Loaded {fname}")
+    model_registry.refresh()
+
+def resolve_bundle(candidates, requested: Optional[str] = None):
+    """Active bundle for an endpoint: the requested one, else the first loaded candidate"""
+    if requested is not None:
+        if requested not in candidates:
+            raise HTTPException(status_code=400, detail=f"model must be one of: {', '.join(candidates)}")
+        bundle = model_registry.get(requested)
+    else:
+        bundle = next((model_registry.get(n) for n in candidates if n in model_registry), None)
+    if bundle is None:
+        raise HTTPException(status_code=503, detail="ML models not loaded")
+    return bundle
 
 # ══════════════════════════════════════════════════════════════════════
 #  LIFESPAN
 # ══════════════════════════════════════════════════════════════════════
+async def load_models_at_startup():
+    with readiness.phase("models"):
+        await asyncio.to_thread(load_ml_models)
+    print(f"Loaded {len(model_registry)} model bundles")
+    if len(model_registry) == 0:
+        readiness.mark("models", FAILED, "no model bundles found")
+
+async def open_database_at_startup():
+    try:
+        with readiness.phase("database"):
+            await asyncio.to_thread(db_pool.open)
+    except Exception as e:
+        print(f"Database pool unavailable at startup: {e}")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    load_ml_models()
-    print(f"Loaded {len(ml_models)} ML model files")
+    readiness.record("app_init", (time.perf_counter() - PROCESS_STARTED) * 1000 - IMPORTS_MS)
+    with readiness.phase("inference_pool"):
+        ml_pool.open()
+    # Unpickling the models and the database handshake overlap
+    await asyncio.gather(load_models_at_startup(), open_database_at_startup())
+    watcher = asyncio.create_task(model_registry.watch(ML_REGISTRY_POLL)) if ML_REGISTRY_POLL > 0 else None
+    poller = asyncio.create_task(usgs_poller.run()) if USGS_POLL_INTERVAL > 0 else None
+    live_sweeper = asyncio.create_task(live_hub.sweep())
+    if DB_LISTEN:
+        # Loads the alert subscriptions itself once LISTEN is active
+        listener = asyncio.create_task(db_listener.run())
+    else:
+        listener = None
+        try:
+            await load_alert_subscriptions()
+        except Exception as e:
+            print(f"Alert subscriptions unavailable at startup: {e}")
+    if WARMUP_ON_STARTUP:
+        # Built off the request path so the first forecast / chat doesn't wait for them
+        readiness.warm("forecaster", forecaster_ready, get_forecaster)
+        readiness.warm("chatbot", asyncio.to_thread, get_chatbot)
+    else:
+        readiness.mark("forecaster", DISABLED)
+        readiness.mark("chatbot", DISABLED)
+    readiness.serving()
+    print(f"Startup finished in {readiness.describe()['startup']['time_to_serving_ms']} ms")
     yield
+    readiness.cancel()
+    if watcher is not None:
+        watcher.cancel()
+    if poller is not None:
+        poller.cancel()
+    live_sweeper.cancel()
+    if listener is not None:
+        listener.cancel()
+    await usgs_poller.close()
+    ml_pool.close()
+    db_pool.close()
 
 # ══════════════════════════════════════════════════════════════════════
 #  FASTAPI APP
@@ -102,13 +257,36 @@ app.add_middleware(
 # ══════════════════════════════════════════════════════════════════════
 #  DATABASE
 # ══════════════════════════════════════════════════════════════════════
-@contextmanager
-def get_db():
-    conn = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
-    try:
-        yield conn
-    finally:
-        conn.close()
+db_pool = DatabasePool(DB_CONFIG, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX)
+
+# ══════════════════════════════════════════════════════════════════════
+#  RESPONSE CACHE
+# ══════════════════════════════════════════════════════════════════════
+response_cache = ResponseCache(
+    RedisCacheBackend(RESPONSE_CACHE_URL) if RESPONSE_CACHE_URL else MemoryCacheBackend(RESPONSE_CACHE_SIZE),
+    ttl=RESPONSE_CACHE_TTL
+)
+tile_cache = TileCache(max_tiles=TILE_CACHE_SIZE, ttl=TILE_CACHE_TTL)
+
+# ══════════════════════════════════════════════════════════════════════
+#  INFERENCE POOL
+# ══════════════════════════════════════════════════════════════════════
+ml_pool = InferencePool(workers=ML_WORKERS, max_queue=ML_QUEUE_MAX, model_threads=ML_MODEL_THREADS)
+prediction_cache = PredictionCache(max_entries=PREDICTION_CACHE_SIZE, step=PREDICTION_CACHE_STEP)
+
+risk_surface = RiskSurface(RiskGrid(*RISK_GRID_BOUNDS, step=RISK_GRID_STEP),
+                           lookback_days=RISK_GRID_LOOKBACK_DAYS, ttl=RISK_GRID_TTL)
+
+# ══════════════════════════════════════════════════════════════════════
+#  READINESS
+# ══════════════════════════════════════════════════════════════════════
+readiness = Readiness(PROCESS_STARTED)
+readiness.record("imports", IMPORTS_MS)
+readiness.add("inference_pool", required=True)
+readiness.add("models", required=True)
+readiness.add("database")
+readiness.add("forecaster")
+readiness.add("chatbot")
 
 # ══════════════════════════════════════════════════════════════════════
 #  PYDANTIC MODELS
@@ -153,6 +331,12 @@ class RiskAssessmentRequest(BaseModel):
     rolling_mean_mag_30d: float = Field(default=4.5, ge=0, le=10)
     days_since_last_major: float = Field(default=30, ge=0)
 
+class PredictMagnitudeBatchRequest(BaseModel):
+    items: List[PredictMagnitudeRequest] = Field(..., min_length=1, max_length=PREDICT_BATCH_MAX)
+
+class RiskAssessmentBatchRequest(BaseModel):
+    items: List[RiskAssessmentRequest] = Field(..., min_length=1, max_length=PREDICT_BATCH_MAX)
+
 class ChatMessage(BaseModel):
     role: str
     content: str
@@ -178,23 +362,27 @@ class AlertSubscription(BaseModel):
 class AlertUnsubscribe(BaseModel):
     userId: str
 
-# Store alert subscriptions
-alert_subscriptions = {}
+# In-memory match index over the alert_subscriptions table (kept current by db_listener)
+alert_matcher = AlertMatcher()
 
 # ══════════════════════════════════════════════════════════════════════
 #  HELPER FUNCTIONS
 # ══════════════════════════════════════════════════════════════════════
-def build_features(data: dict) -> pd.DataFrame:
-    depth = data.get('depth', 10)
-    lat = data.get('lat', 0)
-    lon = data.get('lon', 0)
-    r7 = data.get('rolling_count_7d', 10)
-    r30 = data.get('rolling_count_30d', 50)
-    rm = data.get('rolling_mean_mag_30d', 4.5)
-    dslm = data.get('days_since_last_major', 30)
+def build_features_batch(items: List[dict]) -> pd.DataFrame:
+    """Model input frame for many scenarios at once (one row per item, column-wise math)"""
+    def col(name, default):
+        return np.array([item.get(name, default) for item in items], dtype=np.float64)
+
+    depth = col('depth', 10)
+    lat = col('lat', 0)
+    lon = col('lon', 0)
+    r7 = col('rolling_count_7d', 10)
+    r30 = col('rolling_count_30d', 50)
+    rm = col('rolling_mean_mag_30d', 4.5)
+    dslm = col('days_since_last_major', 30)
     now = datetime.now()
 
-    return pd.DataFrame([{
+    return pd.DataFrame({
         'depth': depth,
         'lat': lat,
         'lon': lon,
@@ -219,40 +407,145 @@ def build_features(data: dict) -> pd.DataFrame:
         'is_weekend': 0,
         'day_of_year': now.timetuple().tm_yday,
         'quarter': (now.month - 1) // 3 + 1,
-    }])
+    }, index=range(len(items)))
 
 
-def check_and_send_alerts(new_earthquake: dict):
-    try:
-        eq_lat = new_earthquake.get('lat')
-        eq_lon = new_earthquake.get('lon')
-        eq_mag = new_earthquake.get('mag')
+def build_features(data: dict) -> pd.DataFrame:
+    return build_features_batch([data])
+
+
+def score_frame(bundle, df: pd.DataFrame, timing: Optional[dict] = None) -> np.ndarray:
+    """One scaler.transform + one predict over every row of df (probabilities in %)"""
+    t0 = time.perf_counter()
+    feats = [f for f in bundle.features if f in df.columns]
+    X_scaled = bundle.scaler.transform(df[feats].fillna(0))
+    t1 = time.perf_counter()
+    if bundle.name in PROBA_BUNDLES:
+        preds = bundle.model.predict_proba(X_scaled)[:, 1] * 100
+    else:
+        preds = bundle.model.predict(X_scaled)
+    if timing is not None:
+        timing['scale_ms'] = (t1 - t0) * 1000
+        timing['predict_ms'] = (time.perf_counter() - t1) * 1000
+    return preds
+
+
+def magnitude_result(pred_mag: float) -> dict:
+    confidence = min(95, 70 + abs(pred_mag - 4.5) * 5)
+    category = 'Major' if pred_mag >= 5.5 else 'Moderate' if pred_mag >= 4.0 else 'Minor'
+    return {
+        "predicted_magnitude": round(pred_mag, 2),
+        "category": category,
+        "confidence": round(confidence, 1)
+    }
 
-        if not all([eq_lat, eq_lon, eq_mag]):
-            return
 
-        for user_id, sub in alert_subscriptions.items():
-            if eq_mag < sub['magnitude']:
-                continue
+def risk_result(prob: float) -> dict:
+    risk_level = 'HIGH' if prob > 70 else 'MODERATE' if prob > 30 else 'LOW'
+    return {"probability": round(prob, 1), "risk_level": risk_level}
+
+
+def to_result(bundle, value: float) -> dict:
+    return risk_result(value) if bundle.name in PROBA_BUNDLES else magnitude_result(value)
+
+
+def score_rows(items: List[tuple]) -> List[dict]:
+    """
+    Micro-batch scorer for (bundle, inputs) items. Each row is scored by the
+    bundle its request resolved (and keyed its cache entry on), so a batch
+    that straddles a hot swap is split per version rather than re-resolved.
+    """
+    groups = {}
+    for i, (bundle, _) in enumerate(items):
+        groups.setdefault(id(bundle), (bundle, []))[1].append(i)
+    results = [None] * len(items)
+    for bundle, positions in groups.values():
+        assembler, fused = bundle.extras['assembler'], bundle.extras['fused']
+        values = fused.predict_many(assembler.assemble_many([items[i][1] for i in positions]))
+        scale = 100 if bundle.name in PROBA_BUNDLES else 1
+        for i, v in zip(positions, values):
+            results[i] = to_result(bundle, v * scale)
+    return results
+
+
+def run_batch(items, bundle) -> dict:
+    """Vectorized batch scoring with a per-stage timing breakdown"""
+    t0 = time.perf_counter()
+    df = build_features_batch(items)
+    timing = {'features_ms': (time.perf_counter() - t0) * 1000}
+    results = [to_result(bundle, float(v)) for v in score_frame(bundle, df, timing)]
+    timing['total_ms'] = (time.perf_counter() - t0) * 1000
+    return {
+        "count": len(results),
+        "model": bundle.name,
+        "model_version": bundle.version,
+        "results": results,
+        "timing": {k: round(v, 3) for k, v in timing.items()},
+    }
 
-            from math import radians, sin, cos, sqrt, atan2
-            lat1, lon1 = radians(sub['lat']), radians(sub['lon'])
-            lat2, lon2 = radians(eq_lat), radians(eq_lon)
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * atan2(sqrt(a), sqrt(1-a))
-            distance_km = 6371 * c
-
-            if distance_km <= sub['radius']:
-                print(f"Sending alert to {sub['email']} - M{eq_mag} at {distance_km:.0f}km")
-                send_earthquake_alert(
-                    sub['email'],
-                    {**new_earthquake, 'distance_km': distance_km},
-                    {'email': sub['email']}
-                )
-    except Exception as e:
-        print(f"Error checking alerts: {e}")
+
+def subscription_entry(row: dict) -> dict:
+    """What the matcher keeps per subscription: just enough to match and send"""
+    return {
+        'email': row['email'],
+        'magnitude': float(row['magnitude']),
+        'radius': float(row['radius_km']),
+        'lat': float(row['lat']),
+        'lon': float(row['lon']),
+    }
+
+def apply_alert_change(change: dict):
+    """One alert_subscriptions notification -> the matcher"""
+    if change['op'] == 'D':
+        alert_matcher.remove(change['user_id'])
+    else:
+        alert_matcher.add(change['user_id'], subscription_entry(change))
+
+async def load_alert_subscriptions():
+    def query_subscriptions(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id, email, magnitude, radius_km, lat, lon FROM alert_subscriptions")
+        return cursor.fetchall()
+
+    rows = await db_pool.run(query_subscriptions)
+    alert_matcher.replace_all({row['user_id']: subscription_entry(row) for row in rows})
+    print(f"Loaded {len(rows)} alert subscriptions")
+
+def send_alerts(events: list) -> int:
+    """Email every subscriber in range of one of these (newly inserted) events -> alerts sent"""
+    matches = alert_matcher.match(events)
+    if not matches:
+        return 0
+    from email_service import send_earthquake_alert
+    sent = 0
+    for event, _, sub, distance_km in matches:
+        print(f"Sending alert to {sub['email']} - M{event['mag']} at {distance_km:.0f}km")
+        try:
+            send_earthquake_alert(sub['email'], {**event, 'distance_km': distance_km}, {'email': sub['email']})
+            sent += 1
+        except Exception as e:
+            print(f"Error sending alert to {sub['email']}: {e}")
+    return sent
+
+# ══════════════════════════════════════════════════════════════════════
+#  MICRO-BATCHING
+# ══════════════════════════════════════════════════════════════════════
+batchers = {
+    name: MicroBatcher(name, score_rows, ml_pool.run,
+                       max_batch=ML_BATCH_MAX, window_ms=ML_BATCH_WINDOW_MS)
+    for name in MAGNITUDE_BUNDLES + CLASSIFIER_BUNDLES
+}
+
+async def cached_prediction(bundle, data: dict) -> dict:
+    """Snap inputs to the cache grid, then serve from the prediction cache or the batcher"""
+    data = prediction_cache.quantize(data)
+    # day_of_year / quarter are model inputs, so answers are only valid for today
+    key = prediction_cache.key(bundle.name, bundle.version, data, datetime.now().date())
+    result = prediction_cache.get(key)
+    if result is None:
+        result = {**await batchers[bundle.name].submit((bundle, data)), "model": bundle.name, "model_version": bundle.version}
+        prediction_cache.put(key, result)
+    return result
 
 # ══════════════════════════════════════════════════════════════════════
 #  ENDPOINTS - HEALTH
@@ -263,10 +556,12 @@ async def root():
 
 @app.get("/api/health")
 async def health_check():
+    def ping(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
+        await db_pool.run(ping)
         db_ok = True
     except:
         db_ok = False
@@ -274,12 +569,35 @@ async def health_check():
     return {
         "status": "online",
         "database": db_ok,
-        "ml_models": len(ml_models) > 0,
+        "ml_models": len(model_registry) > 0,
         "forecasting": os.path.exists(os.path.join(ML_MODELS_PATH, 'forecasting.py')),
         "chatbot": os.path.exists(os.path.join(ML_MODELS_PATH, 'chatbot.py')),
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/api/ready")
+async def ready_check():
+    """Readiness probe: 200 once models are loaded, with per-subsystem warm state and startup timings"""
+    status = readiness.describe()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        "db_pool": db_pool.stats(),
+        "response_cache": await response_cache.stats(),
+        "tile_cache": tile_cache.stats(),
+        "ml_pool": ml_pool.stats(),
+        "ml_batching": {name: b.stats() for name, b in batchers.items()},
+        "prediction_cache": prediction_cache.stats(),
+        "risk_surface": risk_surface.stats(),
+        "usgs_poller": usgs_poller.stats(),
+        "live_hub": live_hub.stats(),
+        "db_listener": db_listener.stats(),
+        "alert_matcher": alert_matcher.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 # ══════════════════════════════════════════════════════════════════════
 #  ENDPOINTS - EARTHQUAKES
 # ══════════════════════════════════════════════════════════════════════
@@ -287,88 +605,183 @@ async def health_check():
 async def get_earthquakes(
     limit: int = Query(500, ge=1, le=5000),
     offset: int = Query(0, ge=0),
-    min_mag: Optional[float] = None,
-    max_mag: Optional[float] = None,
-    days_back: Optional[int] = None,
-    is_major: Optional[bool] = None
+    cursor: Optional[str] = Query(None, description="next_cursor from a previous page; replaces offset"),
+    include_total: bool = True,
+    count_mode: str = Query("fast", pattern="^(fast|exact)$"),
+    filters: dict = Depends(earthquake_filter_params),
+    accept: Optional[str] = Header(None)
 ):
-    with get_db() as conn:
-        cursor = conn.cursor()
-        query = "SELECT * FROM std_sismicity WHERE 1=1"
-        params = []
-
-        if min_mag is not None:
-            query += " AND mag >= %s"
-            params.append(min_mag)
-        if max_mag is not None:
-            query += " AND mag <= %s"
-            params.append(max_mag)
-        if days_back is not None:
-            query += " AND dt >= NOW() - INTERVAL '%s days'"
-            params.append(days_back)
-        if is_major is not None:
-            query += " AND is_major = %s"
-            params.append(is_major)
-
-        count_query = query.replace("SELECT *", "SELECT COUNT(*)")
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()['count']
-
-        query += " ORDER BY dt DESC LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
-        cursor.execute(query, params)
-        results = cursor.fetchall()
+    where, params = build_earthquake_filters(**filters)
+    after = decode_cursor(cursor) if cursor else None
+    columnar = negotiate_columnar(accept)
+    if columnar:
+        require_columnar()
+
+    def query_earthquakes(conn):
+        cur = conn.cursor()
+
+        total, is_estimate = None, False
+        if include_total:
+            total, is_estimate = count_earthquakes(cur, filters, count_mode)
+
+        # Keyset mode seeks straight to (dt, id) on the index instead of
+        # walking and discarding `offset` rows
+        query = "SELECT * FROM std_sismicity" + where
+        page_params = list(params)
+        if after is not None:
+            query += " AND (dt, id) < (%s, %s)"
+            page_params.extend(after)
+        query += " ORDER BY dt DESC, id DESC LIMIT %s"
+        page_params.append(limit)
+        if after is None and offset:
+            query += " OFFSET %s"
+            page_params.append(offset)
+        cur.execute(query, page_params)
+        results = cur.fetchall()
+
+        next_cursor = encode_cursor(results[-1]) if len(results) == limit else None
+        if columnar:
+            return total, is_estimate, next_cursor, cur.description, results
+        return {
+            "count": total,
+            "count_is_estimate": is_estimate,
+            "results": [dict(row) for row in results],
+            "next_cursor": next_cursor
+        }
 
-        return {"count": total, "results": [dict(row) for row in results]}
+    if not columnar:
+        return await db_pool.run(query_earthquakes)
+
+    # Columnar bodies carry only the rows; paging metadata moves to headers
+    total, is_estimate, next_cursor, description, results = await db_pool.run(query_earthquakes)
+    headers = {"X-Count-Is-Estimate": str(is_estimate).lower()}
+    if total is not None:
+        headers["X-Total-Count"] = str(total)
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    body = await asyncio.to_thread(encode_all, columnar, description, results)
+    return Response(content=body, media_type=EXPORT_FORMATS[columnar], headers=headers)
+
+def require_columnar():
+    if not columnar_available():
+        raise HTTPException(status_code=406, detail="Arrow/Parquet output needs pyarrow installed on the server")
+
+export_slots = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+
+@app.get("/api/earthquakes/export")
+async def export_earthquakes(
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson|arrow|parquet)$"),
+    filters: dict = Depends(earthquake_filter_params),
+    accept: Optional[str] = Header(None)
+):
+    # Explicit ?format= wins, then an Arrow/Parquet Accept header, then CSV
+    format = format or negotiate_columnar(accept) or "csv"
+    if format in ("arrow", "parquet"):
+        require_columnar()
+    if export_slots.locked():
+        raise HTTPException(status_code=429, detail="Too many exports running, retry shortly",
+                            headers={"Retry-After": "30"})
+    where, params = build_earthquake_filters(**filters)
+    query = "SELECT * FROM std_sismicity" + where + " ORDER BY dt DESC, id DESC"
+
+    columnar_encoder = None
+    if format in ("arrow", "parquet"):
+        # Fix the schema from the column types now: a failure mid-download would truncate a 200
+        def describe(conn):
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM std_sismicity LIMIT 0")
+            return cursor.description
+
+        try:
+            columnar_encoder = make_encoder(format, await db_pool.run(describe))
+        except ValueError as e:
+            raise HTTPException(status_code=500, detail=f"Export schema error: {e}")
+
+    async def stream():
+        # A named (server-side) cursor keeps the result set in Postgres;
+        # only EXPORT_CHUNK_ROWS rows are ever held in this process.
+        # The slot is taken here, so the few requests that raced past the check above wait for one
+        async with export_slots, db_pool.session() as conn:
+            cur = conn.cursor(name="earthquake_export")
+            cur.itersize = EXPORT_CHUNK_ROWS
+            await db_pool.call(cur.execute, query, params)
+            rows = await db_pool.call(cur.fetchmany, EXPORT_CHUNK_ROWS)
+            # Named cursors only describe their columns after the first fetch
+            encoder = columnar_encoder or make_encoder(format, cur.description)
+            # Arrow / Parquet encoding is CPU-bound: keep it off the event loop
+            yield await asyncio.to_thread(encoder.encode, rows)
+            while rows:
+                rows = await db_pool.call(cur.fetchmany, EXPORT_CHUNK_ROWS)
+                if rows:
+                    yield await asyncio.to_thread(encoder.encode, rows)
+            await db_pool.call(cur.close)
+            yield await asyncio.to_thread(encoder.finish)
+
+    filename = f"seismicity_{datetime.now().strftime('%Y%m%d_%H%M')}.{format}"
+    return StreamingResponse(
+        stream(),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @app.get("/api/earthquakes/stats")
 async def get_stats(days_back: Optional[int] = None):
-    with get_db() as conn:
+    def query_stats(conn):
         cursor = conn.cursor()
-        query = "SELECT COUNT(*) as total, AVG(mag) as avg_mag, MAX(mag) as max_mag, MIN(mag) as min_mag, AVG(depth) as avg_depth, MIN(dt) as date_earliest, MAX(dt) as date_latest FROM std_sismicity"
-        if days_back:
-            query += f" WHERE dt >= NOW() - INTERVAL '{days_back} days'"
-        cursor.execute(query)
+        parts, params = daily_rollup_sql(days_back)
+        cursor.execute(f"""
+            WITH parts AS ({parts})
+            SELECT SUM(event_count)::bigint as total,
+                   SUM(mag_sum) / NULLIF(SUM(event_count), 0) as avg_mag,
+                   MAX(mag_max) as max_mag,
+                   MIN(mag_min) as min_mag,
+                   SUM(depth_sum) / NULLIF(SUM(event_count), 0) as avg_depth,
+                   MIN(dt_min) as date_earliest,
+                   MAX(dt_max) as date_latest,
+                   SUM(event_count) FILTER (WHERE mag_class = 'major')::bigint as major,
+                   SUM(event_count) FILTER (WHERE mag_class = 'moderate')::bigint as moderate,
+                   SUM(event_count) FILTER (WHERE mag_class = 'minor')::bigint as minor
+            FROM parts
+        """, params)
         stats = dict(cursor.fetchone())
 
-        cat_query = "SELECT COUNT(*) FILTER (WHERE mag >= 5.5) as major, COUNT(*) FILTER (WHERE mag >= 4 AND mag < 5.5) as moderate, COUNT(*) FILTER (WHERE mag < 4) as minor FROM std_sismicity"
-        if days_back:
-            cat_query += f" WHERE dt >= NOW() - INTERVAL '{days_back} days'"
-        cursor.execute(cat_query)
-        cats = dict(cursor.fetchone())
-
         return {
             "total": stats['total'] or 0,
             "avg_mag": round(float(stats['avg_mag'] or 0), 2),
             "max_mag": round(float(stats['max_mag'] or 0), 2),
             "min_mag": round(float(stats['min_mag'] or 0), 2),
             "avg_depth": round(float(stats['avg_depth'] or 0), 1),
-            "major_count": cats['major'] or 0,
-            "moderate_count": cats['moderate'] or 0,
-            "minor_count": cats['minor'] or 0,
+            "major_count": stats['major'] or 0,
+            "moderate_count": stats['moderate'] or 0,
+            "minor_count": stats['minor'] or 0,
             "date_earliest": str(stats['date_earliest'])[:10] if stats['date_earliest'] else '',
             "date_latest": str(stats['date_latest'])[:10] if stats['date_latest'] else '',
         }
 
+    return await response_cache.get_or_compute(
+        "stats", {"days_back": days_back}, lambda: db_pool.run(query_stats)
+    )
+
 @app.get("/api/earthquakes/timeline")
 async def get_timeline(
     group_by: str = Query("day", pattern="^(day|month|year)$"),
     days_back: Optional[int] = None
 ):
-    with get_db() as conn:
+    def query_timeline(conn):
         cursor = conn.cursor()
         trunc = group_by
+        parts, params = daily_rollup_sql(days_back)
         query = f"""
-            SELECT DATE_TRUNC('{trunc}', dt) as period,
-                   COUNT(*) as count,
-                   AVG(mag) as avg_mag,
-                   MAX(mag) as max_mag
-            FROM std_sismicity
+            WITH parts AS ({parts})
+            SELECT DATE_TRUNC('{trunc}', day::timestamp) as period,
+                   SUM(event_count)::bigint as count,
+                   SUM(mag_sum) / SUM(event_count) as avg_mag,
+                   MAX(mag_max) as max_mag
+            FROM parts
+            WHERE event_count > 0
+            GROUP BY period ORDER BY period
         """
-        if days_back:
-            query += f" WHERE dt >= NOW() - INTERVAL '{days_back} days'"
-        query += " GROUP BY period ORDER BY period"
-        cursor.execute(query)
+        cursor.execute(query, params)
         results = cursor.fetchall()
         return [{
             "period": str(row['period'])[:10],
@@ -377,22 +790,32 @@ async def get_timeline(
             "max_mag": round(float(row['max_mag']), 2)
         } for row in results]
 
+    return await response_cache.get_or_compute(
+        "timeline", {"group_by": group_by, "days_back": days_back}, lambda: db_pool.run(query_timeline)
+    )
+
 @app.get("/api/earthquakes/by-location")
 async def get_by_location(limit: int = Query(15, ge=1, le=50)):
-    with get_db() as conn:
+    def query_by_location(conn):
         cursor = conn.cursor()
         query = """
-            SELECT place, COUNT(*) as count, AVG(mag) as avg_mag, MAX(mag) as max_mag
-            FROM std_sismicity
-            GROUP BY place ORDER BY count DESC LIMIT %s
+            SELECT NULLIF(place, '') as place, event_count as count,
+                   mag_sum / event_count as avg_mag, mag_max as max_mag
+            FROM sismicity_place_rollup
+            WHERE event_count > 0
+            ORDER BY event_count DESC LIMIT %s
         """
         cursor.execute(query, (limit,))
         results = cursor.fetchall()
         return [dict(row) for row in results]
 
+    return await response_cache.get_or_compute(
+        "by-location", {"limit": limit}, lambda: db_pool.run(query_by_location)
+    )
+
 @app.get("/api/earthquakes/recent")
 async def get_recent(hours: int = Query(24, ge=1, le=168), limit: int = Query(20, ge=1, le=100)):
-    with get_db() as conn:
+    def query_recent(conn):
         cursor = conn.cursor()
         query = """
             SELECT * FROM std_sismicity
@@ -403,95 +826,148 @@ async def get_recent(hours: int = Query(24, ge=1, le=168), limit: int = Query(20
         results = cursor.fetchall()
         return [dict(row) for row in results]
 
+    return await db_pool.run(query_recent)
+
+# ══════════════════════════════════════════════════════════════════════
+#  ENDPOINTS - MAP TILES
+# ══════════════════════════════════════════════════════════════════════
+@app.get("/api/tiles/{z}/{x}/{y}")
+async def get_tile(
+    z: int = Path(..., ge=0, le=MAX_TILE_ZOOM),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    min_mag: Optional[float] = None,
+    max_mag: Optional[float] = None,
+    days_back: Optional[int] = None,
+    is_major: Optional[bool] = None
+):
+    if x >= 2 ** z or y >= 2 ** z:
+        raise HTTPException(status_code=400, detail=f"Tile {z}/{x}/{y} does not exist")
+    filters = {'min_mag': min_mag, 'max_mag': max_mag, 'days_back': days_back, 'is_major': is_major}
+
+    def query_tile(conn):
+        cursor = conn.cursor()
+        cursor.execute(*tile_sql(z, x, y, filters))
+        return tile_payload(z, x, y, cursor.fetchall())
+
+    async def compute():
+        return await db_pool.run(query_tile)
+
+    return await tile_cache.get_or_compute((z, x, y), filters, compute)
+
 # ══════════════════════════════════════════════════════════════════════
 #  ENDPOINTS - USGS LIVE DATA FETCHING
 # ══════════════════════════════════════════════════════════════════════
+async def ingest_features(features: list) -> dict:
+    """Upsert USGS GeoJSON features, invalidate caches, alert and push new / revised events to live clients"""
+    rows, skipped = usgs_rows(features)
+    result = await db_pool.run(upsert_events, rows, INGEST_PAGE_SIZE)
+    inserted, revised = result["inserted"], result["revised"]
+    if inserted or revised:
+        await response_cache.bump_version()
+        tile_cache.invalidate_points(result["points"])
+        risk_surface.mark_points(result["points"])
+
+        # Only events we haven't seen before can trigger alerts
+        if inserted and len(alert_matcher):
+            await asyncio.to_thread(send_alerts, inserted)
+
+        # With the listener up, the change trigger delivers these to every process (this one included)
+        if not db_listener.connected:
+            live_hub.publish_events([live_event({**event, "revised": flag})
+                                     for events, flag in ((inserted, False), (revised, True)) for event in events])
+    return {
+        "inserted": len(inserted),
+        "updated": len(revised),
+        "skipped": skipped + result["unchanged"],
+    }
+
+async def on_catalog_notify(payloads: list):
+    """std_sismicity changed (ETL, poller, another worker): invalidate caches and push the events live"""
+    events, points, bulk = [], [], 0
+    for payload in payloads:
+        change = parse_catalog_notify(payload)
+        events += change["events"]
+        points += change["points"]
+        bulk += change["bulk"]
+    await response_cache.bump_version()
+    if bulk:
+        # Reloads are too large to track cell by cell or to stream
+        tile_cache.clear()
+        risk_surface.invalidate()
+        live_hub.forget()
+    else:
+        tile_cache.invalidate_points(points)
+        risk_surface.mark_points(points)
+    live_hub.publish_events(events)
+
+async def on_db_notify(notifications: list):
+    catalog = [payload for channel, payload in notifications if channel == CATALOG_CHANNEL]
+    if catalog:
+        await on_catalog_notify(catalog)
+    for channel, payload in notifications:
+        if channel == ALERTS_CHANNEL:
+            apply_alert_change(json.loads(payload))
+
+async def on_db_connect(first: bool):
+    """LISTEN is active: (re)load the subscriptions; after a reconnect also start the caches over, changes were missed"""
+    try:
+        await load_alert_subscriptions()
+    except Exception as e:
+        print(f"Alert subscriptions unavailable: {e}")
+    if not first:
+        await response_cache.bump_version()
+        tile_cache.clear()
+        risk_surface.invalidate()
+        live_hub.forget()
+
+db_listener = PgListener(DB_CONFIG, [CATALOG_CHANNEL, ALERTS_CHANNEL], on_db_notify, on_connect=on_db_connect)
+
+async def load_usgs_watermark():
+    def query_watermark(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(updated) AS watermark FROM std_sismicity WHERE event_id IS NOT NULL")
+        return cursor.fetchone()['watermark']
+
+    return await db_pool.run(query_watermark)
+
+usgs_poller = UsgsPoller(
+    ingest_features, load_usgs_watermark, url=USGS_FDSN_URL, interval=USGS_POLL_INTERVAL,
+    min_magnitude=USGS_POLL_MIN_MAG, lookback_hours=USGS_POLL_LOOKBACK_HOURS,
+    timeout=USGS_TIMEOUT, max_backoff=USGS_POLL_MAX_BACKOFF,
+    lease=AdvisoryLease(DB_CONFIG) if USGS_POLL_ELECT else None,
+)
+
 @app.post("/api/earthquakes/fetch-usgs")
 async def fetch_usgs_data(
     days_back: int = Query(7, ge=1, le=30),
     min_magnitude: float = Query(2.5, ge=0, le=10)
 ):
+    """Full re-sync of a window (the background poller only asks for what changed)"""
     try:
         end_time = datetime.now()
         start_time = end_time - timedelta(days=days_back)
 
-        url = "https://earthquake.usgs.gov/fdsnws/event/1/query"
-        params = {
-            'format': 'geojson',
+        features = await usgs_poller.fetch({
             'starttime': start_time.strftime('%Y-%m-%d'),
             'endtime': end_time.strftime('%Y-%m-%d'),
             'minmagnitude': min_magnitude,
             'orderby': 'time'
-        }
-
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        features = data.get('features', [])
-        inserted = 0
-        skipped = 0
-
-        with get_db() as conn:
-            cursor = conn.cursor()
-            for feature in features:
-                props = feature['properties']
-                coords = feature['geometry']['coordinates']
-                dt = datetime.fromtimestamp(props['time'] / 1000)
-                mag = props.get('mag')
-                depth = coords[2] if len(coords) > 2 else 0
-                lat = coords[1]
-                lon = coords[0]
-                place = props.get('place', 'Unknown')
-
-                if mag is None:
-                    skipped += 1
-                    continue
-
-                try:
-                    cursor.execute("""
-                        SELECT COUNT(*) as c FROM std_sismicity
-                        WHERE dt = %s AND lat = %s AND lon = %s AND mag = %s
-                    """, (dt, lat, lon, mag))
-                    exists = cursor.fetchone()['c'] > 0
-
-                    if not exists:
-                        cursor.execute("""
-                            INSERT INTO std_sismicity (dt, mag, depth, lat, lon, place, is_major, source)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                        """, (dt, mag, depth, lat, lon, place, mag >= 5.5, 'USGS'))
-                        inserted += 1
-                    else:
-                        skipped += 1
-                except Exception as e:
-                    print(f"Error inserting event: {e}")
-                    skipped += 1
-
-            conn.commit()
-
-        for feature in features:
-            props = feature['properties']
-            coords = feature['geometry']['coordinates']
-            mag = props.get('mag')
-            if mag is None:
-                continue
-            check_and_send_alerts({
-                'dt': datetime.fromtimestamp(props['time'] / 1000),
-                'mag': mag,
-                'depth': coords[2],
-                'lat': coords[1],
-                'lon': coords[0],
-                'place': props.get('place', 'Unknown')
-            })
+        })
+        result = await ingest_features(features)
+        inserted, updated, skipped = result["inserted"], result["updated"], result["skipped"]
 
         return {
             "success": True,
             "fetched": len(features),
             "inserted": inserted,
+            "updated": updated,
             "skipped": skipped,
-            "message": f"Fetched {len(features)} events. Inserted {inserted} new, skipped {skipped} duplicates."
+            "message": f"Fetched {len(features)} events. Inserted {inserted} new, updated {updated} revised, "
+                       f"skipped {skipped} unchanged."
         }
 
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"USGS API error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
@@ -499,101 +975,179 @@ async def fetch_usgs_data(
 # ══════════════════════════════════════════════════════════════════════
 #  ENDPOINTS - AI/ML
 # ══════════════════════════════════════════════════════════════════════
+MODEL_QUERY = Query(None, description="Bundle to use (default: first loaded); see /api/ai/models")
+
 @app.post("/api/ai/predict-magnitude")
-async def predict_magnitude(req: PredictMagnitudeRequest):
-    if 'mag_model' not in ml_models:
-        raise HTTPException(status_code=503, detail="ML models not loaded")
+async def predict_magnitude(req: PredictMagnitudeRequest, model: Optional[str] = MODEL_QUERY):
+    bundle = resolve_bundle(MAGNITUDE_BUNDLES, model)
     try:
-        df = build_features(req.dict())
-        feats = [f for f in ml_models['mag_features'] if f in df.columns]
-        X = df[feats].fillna(0)
-        X_scaled = ml_models['mag_scaler'].transform(X)
-        pred_mag = float(ml_models['mag_model'].predict(X_scaled)[0])
-        confidence = min(95, 70 + abs(pred_mag - 4.5) * 5)
-        category = 'Major' if pred_mag >= 5.5 else 'Moderate' if pred_mag >= 4.0 else 'Minor'
-        return {
-            "predicted_magnitude": round(pred_mag, 2),
-            "category": category,
-            "confidence": round(confidence, 1)
-        }
+        return await cached_prediction(bundle, req.dict())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/ai/predict-magnitude/batch")
+async def predict_magnitude_batch(req: PredictMagnitudeBatchRequest, model: Optional[str] = MODEL_QUERY):
+    bundle = resolve_bundle(MAGNITUDE_BUNDLES, model)
+    try:
+        items = [item.dict() for item in req.items]
+        return await ml_pool.run(run_batch, items, bundle)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/ai/assess-risk")
-async def assess_risk(req: RiskAssessmentRequest):
-    if 'cls_model' not in ml_models:
-        raise HTTPException(status_code=503, detail="Classifier not loaded")
+async def assess_risk(req: RiskAssessmentRequest, model: Optional[str] = MODEL_QUERY):
+    bundle = resolve_bundle(CLASSIFIER_BUNDLES, model)
+    try:
+        return await cached_prediction(bundle, req.dict())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/ai/assess-risk/batch")
+async def assess_risk_batch(req: RiskAssessmentBatchRequest, model: Optional[str] = MODEL_QUERY):
+    bundle = resolve_bundle(CLASSIFIER_BUNDLES, model)
     try:
-        df = build_features(req.dict())
-        feats = [f for f in ml_models['cls_features'] if f in df.columns]
-        X = df[feats].fillna(0)
-        X_scaled = ml_models['cls_scaler'].transform(X)
-        prob = float(ml_models['cls_model'].predict_proba(X_scaled)[0][1]) * 100
-        risk_level = 'HIGH' if prob > 70 else 'MODERATE' if prob > 30 else 'LOW'
-        return {"probability": round(prob, 1), "risk_level": risk_level}
+        items = [item.dict() for item in req.items]
+        return await ml_pool.run(run_batch, items, bundle)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/ai/risk-grid")
+async def get_risk_grid():
+    """Risk score model over the regional grid, for the map's risk heat layer"""
+    bundle = resolve_bundle(('risk',))
+    try:
+        return await risk_surface.get(bundle, db_pool.run, ml_pool.run)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/ai/models")
+async def get_models():
+    served = {}
+    for endpoint, candidates in (("predict-magnitude", MAGNITUDE_BUNDLES), ("assess-risk", CLASSIFIER_BUNDLES)):
+        bundle = next((model_registry.get(n) for n in candidates if n in model_registry), None)
+        served[endpoint] = f"{bundle.name}@{bundle.version}" if bundle else None
+    bundles = model_registry.describe()
+    for name, info in bundles.items():
+        bundle = model_registry.get(name)
+        if bundle is not None:
+            info["active"]["compiled"] = bundle.extras.get('compiled', False)
+    return {
+        "served": served,
+        "bundles": bundles,
+        "last_checked": model_registry.last_checked,
+        "poll_seconds": ML_REGISTRY_POLL,
+    }
+
+@app.post("/api/ai/models/reload")
+async def reload_models():
+    """Check for new model versions now instead of waiting for the next poll"""
+    swapped = await asyncio.to_thread(model_registry.refresh)
+    return {"swapped": swapped, "active": {n: model_registry.get(n).version for n in model_registry.bundles
+                                           if n in model_registry}}
+
 # ══════════════════════════════════════════════════════════════════════
 #  ENDPOINTS - FORECASTING
 # ══════════════════════════════════════════════════════════════════════
 forecaster = None
+forecaster_lock = threading.Lock()
+forecaster_build = None  # asyncio task of the build in progress, shared by every waiter
 
 def get_forecaster():
+    """Build the forecaster on first use (blocking: reach it through forecaster_ready)"""
     global forecaster
-    if forecaster is None:
+    with forecaster_lock:
+        if forecaster is not None:
+            return forecaster
         try:
-            from forecasting import EarthquakeForecastingSystem
-            forecaster = EarthquakeForecastingSystem(DB_CONFIG)
-            forecaster.load_historical_data(days_back=365)
-            forecaster.train_poisson_forecaster()
+            with readiness.phase("forecaster"):
+                from forecasting import EarthquakeForecastingSystem
+                f = EarthquakeForecastingSystem(DB_CONFIG)
+                f.load_historical_data(days_back=365)
+                if f.historical_data is None:
+                    # Don't keep an empty forecaster around; retry on the next request
+                    raise RuntimeError("no historical data loaded")
+                f.train_poisson_forecaster()
+            forecaster = f
         except Exception as e:
             print(f"Forecaster init error: {e}")
-    return forecaster
+        return forecaster
+
+async def forecaster_ready(build=get_forecaster):
+    """
+    The forecaster, built once on a plain thread: the 365-day load must not park
+    an inference pool worker. Warm-up and early requests await the same build.
+    """
+    global forecaster_build
+    if forecaster is not None:
+        return forecaster
+    if forecaster_build is None or forecaster_build.done():
+        forecaster_build = asyncio.ensure_future(asyncio.to_thread(build))
+    return await asyncio.shield(forecaster_build)
 
 @app.get("/api/forecast")
 async def get_forecast(days_ahead: int = Query(7, ge=1, le=30)):
-    f = get_forecaster()
-    if not f:
-        raise HTTPException(status_code=503, detail="Forecasting unavailable")
-    result = f.forecast_next_events(days_ahead=days_ahead)
-    return {"days_ahead": days_ahead, "forecasts": result}
+    async def compute():
+        f = await forecaster_ready()
+        if not f:
+            raise HTTPException(status_code=503, detail="Forecasting unavailable")
+        result = await ml_pool.run(lambda: f.forecast_next_events(days_ahead=days_ahead))
+        return {"days_ahead": days_ahead, "forecasts": result}
+
+    return await response_cache.get_or_compute("forecast", {"days_ahead": days_ahead}, compute)
 
 @app.get("/api/forecast/hotspots")
 async def get_hotspots(eps_km: float = Query(50, ge=10, le=200), min_samples: int = Query(5, ge=2, le=20)):
-    f = get_forecaster()
-    if not f:
-        raise HTTPException(status_code=503, detail="Forecasting unavailable")
-    result = f.identify_hotspots(eps_km=eps_km, min_samples=min_samples)
-    return {"hotspots": result, "count": len(result)}
+    async def compute():
+        f = await forecaster_ready()
+        if not f:
+            raise HTTPException(status_code=503, detail="Forecasting unavailable")
+        result = await ml_pool.run(lambda: f.identify_hotspots(eps_km=eps_km, min_samples=min_samples))
+        return {"hotspots": result, "count": len(result)}
+
+    return await response_cache.get_or_compute(
+        "hotspots", {"eps_km": eps_km, "min_samples": min_samples}, compute
+    )
 
 @app.post("/api/forecast/proximity")
 async def check_proximity(req: ProximityRequest):
-    f = get_forecaster()
+    f = await forecaster_ready()
     if not f:
         raise HTTPException(status_code=503, detail="Forecasting unavailable")
-    alerts = f.check_proximity_alert(req.lat, req.lon, req.radius_km, req.hours_back)
+    alerts = await ml_pool.run(f.check_proximity_alert, req.lat, req.lon, req.radius_km, req.hours_back)
     return {"alerts": alerts, "count": len(alerts)}
 
 # ══════════════════════════════════════════════════════════════════════
 #  ENDPOINTS - CHAT (GEMINI POWERED)
 # ══════════════════════════════════════════════════════════════════════
 chatbot = None
+chatbot_lock = threading.Lock()
 
 def get_chatbot():
     global chatbot
-    if chatbot is None:
-        try:
-            from chatbot import SeismicityChatbot
-            chatbot = SeismicityChatbot()
-            print("Groq chatbot loaded successfully")
-        except Exception as e:
-            print(f"Chatbot init error: {e}")
-    return chatbot
+    with chatbot_lock:
+        if chatbot is None:
+            try:
+                with readiness.phase("chatbot"):
+                    from chatbot import SeismicityChatbot
+                    chatbot = SeismicityChatbot()
+                print("Groq chatbot loaded successfully")
+            except Exception as e:
+                print(f"Chatbot init error: {e}")
+        return chatbot
 
 @app.post("/api/chat")
 async def chat(req: ChatRequest):
-    bot = get_chatbot()
+    bot = await asyncio.to_thread(get_chatbot)
     if not bot:
         raise HTTPException(status_code=503, detail="Chatbot unavailable — check GROQ_API_KEY in .env")
 
@@ -602,7 +1156,8 @@ async def chat(req: ChatRequest):
 
     try:
         history = [{"role": msg.role, "content": msg.content} for msg in req.history] if req.history else []
-        reply = bot.answer_question(req.message, history)
+        # Blocking HTTP call to the LLM
+        reply = await asyncio.to_thread(bot.answer_question, req.message, history)
         return {
             "response": reply,
             "timestamp": datetime.now().isoformat()
@@ -611,80 +1166,242 @@ async def chat(req: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 # ══════════════════════════════════════════════════════════════════════
-#  WEBSOCKET - LIVE UPDATES
+#  LIVE UPDATES - WEBSOCKET / SERVER-SENT EVENTS
 # ══════════════════════════════════════════════════════════════════════
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
-
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+live_hub = LiveHub(max_queue=LIVE_QUEUE_MAX, idle_timeout=LIVE_IDLE_TIMEOUT, history=LIVE_HISTORY)
+
+async def live_backlog(resume_from: Optional[int], live_filter) -> list:
+    """
+    Messages a client gets before live streaming starts: a snapshot (latest
+    event + current seq) for a fresh connection, or every matching event after
+    `resume_from` - from the hub's buffer, else the database, else a "resync"
+    when the gap is over LIVE_REPLAY_MAX events. Register the subscriber right
+    after awaiting this (no await in between) so nothing falls into the gap.
+
+    Delivery is at-least-once for any event committed within LIVE_RESUME_MARGIN
+    seqs of the resume point: replay starts that far back, so some events
+    arrive twice and clients dedupe on (event_id, seq). Writers committing
+    further out of order than that can still be missed.
+    """
+    since = None if resume_from is None else max(0, resume_from - LIVE_RESUME_MARGIN)
+    if resume_from is not None:
+        events = live_hub.replay(since, live_filter)
+        if events is not None:
+            return [{"type": "replay", "seq": max(batch_seq(events) or 0, resume_from), "data": events}]
+
+    def query_backlog(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(change_seq) AS seq FROM std_sismicity")
+        seq = cursor.fetchone()['seq'] or 0
+        if resume_from is None:
+            cursor.execute("SELECT *, change_seq AS seq FROM std_sismicity ORDER BY dt DESC LIMIT 1")
+        else:
+            cursor.execute("""
+                SELECT *, change_seq AS seq FROM std_sismicity
+                WHERE change_seq > %s AND change_seq <= %s
+                ORDER BY change_seq
+                LIMIT %s
+            """, (since, seq, LIVE_REPLAY_MAX + LIVE_RESUME_MARGIN + 1))
+        return seq, cursor.fetchall()
+
+    seq, rows = await db_pool.run(query_backlog)
+    if resume_from is None:
+        # Fresh client: only what the hub published after the snapshot query
+        tail = live_hub.replay(seq, live_filter) or []
+    else:
+        # Whatever the hub published while the query ran, late commits below `seq` included
+        sent = {(row['event_id'], row['seq']) for row in rows}
+        tail = [e for e in live_hub.replay(max(0, seq - LIVE_RESUME_MARGIN), live_filter) or []
+                if (e['event_id'], e['seq']) not in sent]
+    tail_messages = [{"type": "new_events", "seq": batch_seq(tail), "data": tail}] if tail else []
+    if resume_from is None:
+        snapshot = [{"type": "latest_event", "seq": seq, "data": live_event(rows[0])}] if rows else []
+        return snapshot + tail_messages
+    if len(rows) > LIVE_REPLAY_MAX + LIVE_RESUME_MARGIN:
+        # Too far behind to stream: the client reloads and carries on from here
+        return [{"type": "resync", "seq": seq}] + tail_messages
+    events = [e for e in map(live_event, rows) if live_filter.matches(e)]
+    return [{"type": "replay", "seq": max(seq, resume_from), "data": events}] + tail_messages
+
+async def websocket_sender(websocket: WebSocket, subscriber):
+    """Drain one subscriber's queue into its socket; a stuck client is dropped after LIVE_SEND_TIMEOUT"""
+    try:
+        while (message := await subscriber.get()) is not None:
+            await asyncio.wait_for(websocket.send_text(message.text), LIVE_SEND_TIMEOUT)
+    except Exception:
+        pass
+    # Evicted, timed out or gone: make the receive loop finish too
+    live_hub.unregister(subscriber)
+    try:
+        await websocket.close(code=1001)
+    except Exception:
+        pass
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+@app.websocket("/ws/live")
+async def websocket_live(websocket: WebSocket, min_mag: Optional[float] = None, bbox: Optional[str] = None,
+                         resume_from: Optional[int] = None):
+    try:
+        live_filter = LiveFilter.parse(min_mag, bbox)
+    except ValueError:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        backlog = await live_backlog(resume_from, live_filter)
+    except Exception as e:
+        print(f"Live backlog unavailable: {e}")
+        backlog = []
+    subscriber = live_hub.register(live_filter, "ws")
+    for message in backlog:
+        live_hub.send(subscriber, message)
+    sender = asyncio.create_task(websocket_sender(websocket, subscriber))
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
+    try:
+        while True:
             try:
-                await connection.send_json(message)
-            except:
-                pass
+                msg = json.loads(await websocket.receive_text())
+            except json.JSONDecodeError:
+                continue
+            subscriber.touch()
+            if msg.get('type') == 'ping':
+                live_hub.send(subscriber, {"type": "pong"}, key="pong")
+            elif msg.get('type') == 'subscribe':
+                try:
+                    subscriber.filter = LiveFilter.parse(msg.get('min_mag'), msg.get('bbox'))
+                    live_hub.send(subscriber, {"type": "subscribed", "filter": subscriber.filter.describe()})
+                except (ValueError, TypeError) as e:
+                    live_hub.send(subscriber, {"type": "error", "detail": str(e)})
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        live_hub.unregister(subscriber)
+        sender.cancel()
 
-manager = ConnectionManager()
+async def sse_stream(subscriber):
+    """Frames for one SSE subscriber; a keepalive comment every LIVE_SSE_KEEPALIVE seconds also detects dead clients"""
+    try:
+        # Ask EventSource to come back quickly; it resends the last id as Last-Event-ID
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.get(), LIVE_SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                subscriber.touch()
+                yield ": keepalive\n\n"
+                continue
+            if message is None:
+                break
+            subscriber.touch()
+            yield message.sse()
+            if message.type == "dropped":
+                # Fell behind: end the stream so the client reconnects and replays from its last id
+                break
+    finally:
+        live_hub.unregister(subscriber)
 
-@app.websocket("/ws/live")
-async def websocket_live(websocket: WebSocket):
-    await manager.connect(websocket)
+@app.get("/api/stream/events")
+async def stream_events(
+    min_mag: Optional[float] = None,
+    bbox: Optional[str] = Query(None, description="min_lat,min_lon,max_lat,max_lon"),
+    resume_from: Optional[int] = None,
+    last_event_id: Optional[str] = Header(None)
+):
+    """Read-only live feed over Server-Sent Events: same hub, filters and messages as /ws/live, seq as the event id"""
     try:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM std_sismicity ORDER BY dt DESC LIMIT 1")
-            latest = cursor.fetchone()
-            if latest:
-                await websocket.send_json({"type": "latest_event", "data": dict(latest)})
-    except:
-        pass
+        live_filter = LiveFilter.parse(min_mag, bbox)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if last_event_id and last_event_id.isdigit():
+        resume_from = int(last_event_id)
 
     try:
-        while True:
-            data = await websocket.receive_text()
-            msg = json.loads(data)
-            if msg.get('type') == 'ping':
-                await websocket.send_json({"type": "pong"})
-    except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        backlog = await live_backlog(resume_from, live_filter)
+    except Exception as e:
+        print(f"Live backlog unavailable: {e}")
+        backlog = []
+    subscriber = live_hub.register(live_filter, "sse")
+    for message in backlog:
+        live_hub.send(subscriber, message)
+
+    return StreamingResponse(
+        sse_stream(subscriber),
+        media_type="text/event-stream",
+        # No proxy buffering, or events sit in nginx until its buffer fills
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # ══════════════════════════════════════════════════════════════════════
 #  ALERT ENDPOINTS
 # ══════════════════════════════════════════════════════════════════════
 @app.post("/api/alerts/subscribe")
 async def subscribe_to_alerts(sub: AlertSubscription):
+    def upsert_subscription(conn):
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO alert_subscriptions (user_id, email, magnitude, radius_km, lat, lon)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (user_id) DO UPDATE SET
+                email = EXCLUDED.email,
+                magnitude = EXCLUDED.magnitude,
+                radius_km = EXCLUDED.radius_km,
+                lat = EXCLUDED.lat,
+                lon = EXCLUDED.lon,
+                updated_at = NOW()
+        """, (sub.userId, sub.email, sub.magnitude, sub.radius, sub.lat, sub.lon))
+        conn.commit()
+
     try:
-        alert_subscriptions[sub.userId] = {
-            'email': sub.email,
-            'magnitude': sub.magnitude,
-            'radius': sub.radius,
-            'lat': sub.lat,
-            'lon': sub.lon,
-            'subscribed_at': datetime.now().isoformat()
-        }
+        await db_pool.run(upsert_subscription)
+        # With the listener up, the table's NOTIFY updates every worker's matcher (this one included)
+        if not db_listener.connected:
+            apply_alert_change({'op': 'I', 'user_id': sub.userId, 'email': sub.email, 'magnitude': sub.magnitude,
+                                'radius_km': sub.radius, 'lat': sub.lat, 'lon': sub.lon})
         return {"success": True, "message": f"Subscribed to M{sub.magnitude}+ alerts within {sub.radius}km"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/alerts/unsubscribe")
 async def unsubscribe_from_alerts(unsub: AlertUnsubscribe):
+    def delete_subscription(conn):
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM alert_subscriptions WHERE user_id = %s", (unsub.userId,))
+        conn.commit()
+
     try:
-        if unsub.userId in alert_subscriptions:
-            del alert_subscriptions[unsub.userId]
+        await db_pool.run(delete_subscription)
+        if not db_listener.connected:
+            apply_alert_change({'op': 'D', 'user_id': unsub.userId})
         return {"success": True, "message": "Unsubscribed from alerts"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/alerts/subscribers")
-async def get_subscribers():
-    return {"count": len(alert_subscriptions), "subscribers": list(alert_subscriptions.values())}
+async def get_subscribers(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="next_cursor from a previous page")
+):
+    def query_subscribers(conn):
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) AS count FROM alert_subscriptions")
+        total = cur.fetchone()['count']
+        cur.execute("""
+            SELECT id, user_id, email, magnitude, radius_km AS radius, lat, lon, subscribed_at, updated_at
+            FROM alert_subscriptions
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+        """, (cursor or 0, limit))
+        results = cur.fetchall()
+        return {
+            "count": total,
+            "subscribers": [dict(row) for row in results],
+            "next_cursor": results[-1]['id'] if len(results) == limit else None
+        }
+
+    try:
+        return await db_pool.run(query_subscribers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/alerts/test")
 async def test_alert(email: str):
@@ -696,6 +1413,7 @@ async def test_alert(email: str):
             'dt': datetime.now(),
             'distance_km': 45
         }
+        from email_service import send_earthquake_alert
         result = send_earthquake_alert(email, test_earthquake, {'email': email})
         if result:
             return {"success": True, "message": f"Test email sent to {email}"}
@@ -0,0 +1,200 @@
+"""
+Versioned model registry with background hot reload
+A bundle is model + scaler + feature list + metrics. Versions live under
+ML_MODELS_PATH/registry/<bundle>/<version>/ (written by ml/train_model.py);
+the flat *.pkl files next to train_model.py are served as a "flat-<mtime>"
+version so existing deployments keep working
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import joblib
+
+MANIFEST = "manifest.json"
+
+# bundle -> (model, scaler, features) file names of the flat layout
+FLAT_FILES = {
+    'magnitude': ('magnitude_predictor.pkl', 'magnitude_scaler.pkl', 'magnitude_features.pkl'),
+    'magnitude_xgb': ('magnitude_xgb.pkl', 'magnitude_scaler.pkl', 'magnitude_features.pkl'),
+    'classifier': ('major_event_classifier.pkl', 'classifier_scaler.pkl', 'classifier_features.pkl'),
+    'classifier_xgb': ('classifier_xgb.pkl', 'classifier_scaler.pkl', 'classifier_features.pkl'),
+    'risk': ('risk_score_model.pkl', 'risk_scaler.pkl', 'risk_features.pkl'),
+}
+
+
+class ModelBundle:
+    def __init__(self, name, version, model, scaler, features, metrics=None, source=None):
+        self.name = name
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.features = list(features)
+        self.metrics = metrics or {}
+        self.source = source
+        self.loaded_at = None
+        self.load_ms = None
+        # Filled by the registry's prepare hook (e.g. FeatureAssembler / FusedModel)
+        self.extras = {}
+
+    def describe(self) -> dict:
+        return {
+            "version": self.version,
+            "model": type(self.model).__name__,
+            "features": len(self.features),
+            "metrics": self.metrics,
+            "source": self.source,
+            "loaded_at": self.loaded_at,
+            "load_ms": self.load_ms,
+        }
+
+
+class ModelRegistry:
+    """
+    Tracks the active version of every bundle and swaps in newer ones.
+
+    Loading happens off the request path; the swap is a single dict rebind,
+    so in-flight requests finish on the bundle they already hold while new
+    requests see the new version.
+    """
+
+    def __init__(self, root: str, bundles=None, prepare=None, on_swap=None, load_workers: int = 4):
+        self.root = root
+        self.registry_dir = os.path.join(root, "registry")
+        self.bundles = list(bundles or FLAT_FILES)
+        self.prepare = prepare
+        self.on_swap = on_swap
+        self.load_workers = max(1, load_workers)
+        self._active = {}
+        self._refresh_lock = threading.Lock()
+        self.errors = {}
+        self.last_checked = None
+
+    # ── discovery ────────────────────────────────────────────────────
+    def versions(self, name: str) -> list:
+        """Complete registry versions of a bundle, oldest first (a version is complete once its manifest exists)"""
+        bundle_dir = os.path.join(self.registry_dir, name)
+        if not os.path.isdir(bundle_dir):
+            return []
+        return sorted(v for v in os.listdir(bundle_dir)
+                      if os.path.isfile(os.path.join(bundle_dir, v, MANIFEST)))
+
+    def _flat_version(self, name: str):
+        paths = [os.path.join(self.root, f) for f in FLAT_FILES.get(name, ())]
+        if not paths or not all(os.path.exists(p) for p in paths):
+            return None
+        mtime = max(os.path.getmtime(p) for p in paths)
+        return "flat-" + datetime.fromtimestamp(mtime).strftime("%Y%m%dT%H%M%S")
+
+    def latest(self, name: str):
+        versions = self.versions(name)
+        if versions:
+            return versions[-1]
+        return self._flat_version(name)
+
+    # ── loading ──────────────────────────────────────────────────────
+    def load(self, name: str, version: str) -> ModelBundle:
+        started = time.perf_counter()
+        if version.startswith("flat-"):
+            model_file, scaler_file, features_file = FLAT_FILES[name]
+            bundle = ModelBundle(
+                name, version,
+                joblib.load(os.path.join(self.root, model_file)),
+                joblib.load(os.path.join(self.root, scaler_file)),
+                joblib.load(os.path.join(self.root, features_file)),
+                source=os.path.join(self.root, model_file),
+            )
+        else:
+            path = os.path.join(self.registry_dir, name, version)
+            with open(os.path.join(path, MANIFEST)) as f:
+                manifest = json.load(f)
+            bundle = ModelBundle(
+                name, version,
+                joblib.load(os.path.join(path, manifest.get("model", "model.pkl"))),
+                joblib.load(os.path.join(path, manifest.get("scaler", "scaler.pkl"))),
+                joblib.load(os.path.join(path, manifest.get("features", "features.pkl"))),
+                metrics=manifest.get("metrics"),
+                source=path,
+            )
+        if self.prepare is not None:
+            self.prepare(bundle)
+        bundle.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        bundle.loaded_at = datetime.now().isoformat()
+        return bundle
+
+    def _load_or_error(self, name: str, version: str):
+        try:
+            return self.load(name, version), None
+        except Exception as e:
+            return None, e
+
+    def refresh(self) -> list:
+        """Load any bundle whose latest version differs from the active one -> names swapped (blocking)"""
+        swapped = []
+        with self._refresh_lock:
+            stale = []
+            for name in self.bundles:
+                version = self.latest(name)
+                current = self._active.get(name)
+                if version is not None and (current is None or current.version != version):
+                    stale.append((name, version))
+
+            # Bundles load side by side: XGBoost deserialization and file reads
+            # release the GIL, and one slow forest no longer delays the rest
+            if len(stale) > 1 and self.load_workers > 1:
+                with ThreadPoolExecutor(max_workers=min(self.load_workers, len(stale)),
+                                        thread_name_prefix="model-load") as executor:
+                    loaded = list(executor.map(lambda nv: self._load_or_error(*nv), stale))
+            else:
+                loaded = [self._load_or_error(name, version) for name, version in stale]
+
+            active = dict(self._active)
+            for (name, version), (bundle, error) in zip(stale, loaded):
+                if error is not None:
+                    # Keep serving the previous version
+                    self.errors[name] = f"{version}: {error}"
+                    print(f"Model bundle {name} {version} failed to load: {error}")
+                    continue
+                self.errors.pop(name, None)
+                active[name] = bundle
+                swapped.append(name)
+                print(f"Model bundle {name} -> {version} ({bundle.load_ms} ms)")
+            self._active = active
+            self.last_checked = datetime.now().isoformat()
+        if swapped and self.on_swap is not None:
+            self.on_swap(swapped)
+        return swapped
+
+    async def watch(self, interval: float):
+        """Poll for new versions forever (run as a background task)"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                print(f"Model registry refresh failed: {e}")
+
+    # ── lookup ───────────────────────────────────────────────────────
+    def get(self, name: str):
+        return self._active.get(name)
+
+    def __contains__(self, name):
+        return name in self._active
+
+    def __len__(self):
+        return len(self._active)
+
+    def describe(self) -> dict:
+        active = self._active
+        return {
+            name: {
+                "active": active[name].describe() if name in active else None,
+                "available": self.versions(name) or ([self._flat_version(name)] if self._flat_version(name) else []),
+                "error": self.errors.get(name),
+            }
+            for name in self.bundles
+        }
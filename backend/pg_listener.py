@@ -0,0 +1,171 @@
+"""
+Postgres LISTEN/NOTIFY listener for catalog and alert subscription changes
+One dedicated autocommit connection per API process is registered with the
+event loop (add_reader), so notifications are handled the moment they arrive
+without a thread or a polling query
+"""
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import psycopg2
+import psycopg2.extensions
+
+CATALOG_CHANNEL = "std_sismicity_events"
+ALERTS_CHANNEL = "alert_subscriptions"
+
+# Column order of the row arrays notify_std_sismicity_change() sends (seq since the change_seq migration)
+NOTIFY_COLUMNS = ('id', 'event_id', 'dt', 'mag', 'depth', 'lat', 'lon', 'place', 'old_lat', 'old_lon', 'seq')
+
+
+def parse_catalog_notify(payload: str) -> dict:
+    """
+    Trigger payload -> {"events": [...], "points": [(lat, lon)], "bulk": n}.
+    events are live-feed dicts (revised=True for updates); points are every
+    (lat, lon) whose map cell changed, old positions of moved events included.
+    """
+    message = json.loads(payload)
+    result = {"events": [], "points": [], "bulk": 0}
+    if message.get('op') == 'bulk':
+        result["bulk"] = int(message.get('count') or 0)
+        return result
+
+    revised = message.get('op') == 'U'
+    for values in message.get('rows') or []:
+        row = dict(zip(NOTIFY_COLUMNS, values))
+        event = {k: row[k] for k in NOTIFY_COLUMNS[:8]}
+        event['dt'] = datetime.fromtimestamp(row['dt'] / 1000, tz=timezone.utc).isoformat()
+        for k in ('mag', 'depth', 'lat', 'lon'):
+            event[k] = None if event[k] is None else float(event[k])
+        event['seq'] = row.get('seq')
+        event['revised'] = revised
+        result["events"].append(event)
+        if event['lat'] is not None and event['lon'] is not None:
+            result["points"].append((event['lat'], event['lon']))
+        if row['old_lat'] is not None and row['old_lon'] is not None:
+            result["points"].append((float(row['old_lat']), float(row['old_lon'])))
+    return result
+
+
+class PgListener:
+    """
+    LISTENs on `channels` and awaits handler([(channel, payload), ...]) with
+    every burst of notifications that arrived together (one call per socket
+    wakeup, not per NOTIFY). A lost connection is reopened with capped backoff.
+
+    on_connect(first) is awaited once LISTEN is active on each (re)connect:
+    the place to load state the notifications then keep current, and after a
+    reconnect to resync whatever was missed meanwhile.
+    """
+
+    def __init__(self, db_config: dict, channels, handler, on_connect=None,
+                 max_backoff: float = 60, keepalive_idle: int = 30):
+        self.db_config = db_config
+        self.channels = list(channels)
+        self.handler = handler
+        self.on_connect = on_connect
+        self.max_backoff = max_backoff
+        self.keepalive_idle = keepalive_idle
+        self._conn = None
+        self._pending = []
+        self._wakeup = None
+        self._lost = None
+        self.connected = False
+        self.connects = 0
+        self.notifications = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_notify_at = None
+
+    def _connect(self):
+        # TCP keepalives turn a silently dropped link into a socket error the reader sees
+        conn = psycopg2.connect(
+            keepalives=1, keepalives_idle=self.keepalive_idle,
+            keepalives_interval=10, keepalives_count=3, **self.db_config
+        )
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        cursor = conn.cursor()
+        for channel in self.channels:
+            cursor.execute(f"LISTEN {channel}")
+        cursor.close()
+        return conn
+
+    def _readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            if not self._lost.done():
+                self._lost.set_exception(e)
+            return
+        if self._conn.notifies:
+            self._pending.extend((n.channel, n.payload) for n in self._conn.notifies)
+            self._conn.notifies.clear()
+            self._wakeup.set()
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        self._conn = await asyncio.to_thread(self._connect)
+        self._lost = loop.create_future()
+        self._wakeup = asyncio.Event()
+        loop.add_reader(self._conn.fileno(), self._readable)
+        self.connected = True
+        self.connects += 1
+        print(f"Listening for database changes on {', '.join(self.channels)}")
+        try:
+            if self.on_connect is not None:
+                await self.on_connect(self.connects == 1)
+            while True:
+                waiter = asyncio.ensure_future(self._wakeup.wait())
+                await asyncio.wait({waiter, self._lost}, return_when=asyncio.FIRST_COMPLETED)
+                if self._lost.done():
+                    waiter.cancel()
+                    self._lost.result()
+                self._wakeup.clear()
+                notifications, self._pending = self._pending, []
+                if notifications:
+                    await self._dispatch(notifications)
+        finally:
+            self.connected = False
+            loop.remove_reader(self._conn.fileno())
+            self._conn.close()
+
+    async def _dispatch(self, notifications: list):
+        self.notifications += len(notifications)
+        self.batches += 1
+        self.last_notify_at = datetime.now(timezone.utc).isoformat()
+        try:
+            await self.handler(notifications)
+        except Exception as e:
+            # A bad payload must not tear down the connection
+            self.errors += 1
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Notification handler failed: {self.last_error}")
+
+    async def run(self):
+        """Listen forever, reconnecting after failures (run as a background task)"""
+        failures = 0
+        while True:
+            connects = self.connects
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Database listener lost its connection: {self.last_error}")
+            failures = 0 if self.connects > connects else failures + 1
+            await asyncio.sleep(min(self.max_backoff, 2 ** failures))
+
+    def stats(self) -> dict:
+        return {
+            "channels": self.channels,
+            "connected": self.connected,
+            "connects": self.connects,
+            "notifications": self.notifications,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_notify_at": self.last_notify_at,
+        }
@@ -0,0 +1,283 @@
+"""
+Precomputed regional risk surface from the risk score model
+The region is split into a lat/lon grid; per-cell catalog aggregates become
+risk-model features and every cell is scored in one vectorized pass. The raster
+stays in memory and only the cells touched by newly ingested events are re-scored
+"""
+import asyncio
+import math
+import time
+from datetime import datetime
+
+import numpy as np
+
+from catalog import grid_cells
+
+# Per-cell catalog aggregates, in the order cell_stats_sql() selects them
+CELL_STATS = [
+    'count_7d', 'count_30d', 'mean_mag_30d', 'max_mag', 'mean_depth', 'days_since_last_major',
+]
+
+
+class RiskGrid:
+    """Regular lat/lon grid; cell (row, col) starts at the south-west corner, rows run south -> north"""
+
+    def __init__(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, step: float):
+        self.min_lat, self.min_lon = min_lat, min_lon
+        self.step = step
+        self.rows = max(1, math.ceil((max_lat - min_lat) / step))
+        self.cols = max(1, math.ceil((max_lon - min_lon) / step))
+        self.max_lat = min_lat + self.rows * step
+        self.max_lon = min_lon + self.cols * step
+        self.size = self.rows * self.cols
+
+    def cell(self, lat: float, lon: float):
+        """Flat cell index of a point, or None outside the grid"""
+        row = math.floor((lat - self.min_lat) / self.step)
+        col = math.floor((lon - self.min_lon) / self.step)
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return row * self.cols + col
+        return None
+
+    def centers(self, cells: np.ndarray):
+        """Cell-centre (lat, lon) arrays for flat cell indices"""
+        return (self.min_lat + (cells // self.cols + 0.5) * self.step,
+                self.min_lon + (cells % self.cols + 0.5) * self.step)
+
+    def bounds(self) -> dict:
+        return {"min_lat": self.min_lat, "min_lon": self.min_lon,
+                "max_lat": self.max_lat, "max_lon": self.max_lon}
+
+
+def cell_stats_sql(grid: RiskGrid, as_of: datetime, lookback_days: int, cells=None):
+    """Per-cell aggregates over the lookback window (optionally only for some flat cell indices) -> (sql, params)"""
+    params = {
+        'min_lat': grid.min_lat, 'min_lon': grid.min_lon,
+        'max_lat': grid.max_lat, 'max_lon': grid.max_lon,
+        'step': grid.step, 'as_of': as_of, 'lookback': lookback_days,
+    }
+    where = ""
+    if cells is not None:
+        cells = sorted(cells)
+        params['rows'] = [c // grid.cols for c in cells]
+        params['cols'] = [c % grid.cols for c in cells]
+        where = """
+          AND (FLOOR((lat - %(min_lat)s) / %(step)s)::int, FLOOR((lon - %(min_lon)s) / %(step)s)::int)
+              IN (SELECT * FROM unnest(%(rows)s::int[], %(cols)s::int[]))"""
+        # Let the grid_cell index narrow the scan to the touched area
+        lats, lons = grid.centers(np.asarray(cells))
+        half = grid.step / 2
+        catalog_cells = grid_cells(lats.min() - half, lons.min() - half, lats.max() + half, lons.max() + half)
+        if catalog_cells is not None:
+            params['grid_cells'] = catalog_cells
+            where += "\n          AND grid_cell = ANY(%(grid_cells)s)"
+
+    sql = f"""
+        SELECT FLOOR((lat - %(min_lat)s) / %(step)s)::int AS row,
+               FLOOR((lon - %(min_lon)s) / %(step)s)::int AS col,
+               COUNT(*) FILTER (WHERE dt >= %(as_of)s - INTERVAL '7 days') AS count_7d,
+               COUNT(*) FILTER (WHERE dt >= %(as_of)s - INTERVAL '30 days') AS count_30d,
+               AVG(mag) FILTER (WHERE dt >= %(as_of)s - INTERVAL '30 days') AS mean_mag_30d,
+               MAX(mag) AS max_mag,
+               AVG(depth) AS mean_depth,
+               EXTRACT(EPOCH FROM %(as_of)s - MAX(dt) FILTER (WHERE is_major = 1)) / 86400.0 AS days_since_last_major
+        FROM std_sismicity
+        WHERE dt >= %(as_of)s - %(lookback)s * INTERVAL '1 day'
+          AND mag IS NOT NULL
+          AND lat >= %(min_lat)s AND lat < %(max_lat)s
+          AND lon >= %(min_lon)s AND lon < %(max_lon)s{where}
+        GROUP BY 1, 2
+    """
+    return sql, params
+
+
+def cell_features(grid: RiskGrid, stats: dict, cells: np.ndarray, lookback_days: int) -> dict:
+    """Risk-model feature columns for the given cells (same derivations as build_features)"""
+    lat, lon = grid.centers(cells)
+    depth = stats['mean_depth'][cells]
+    r7 = stats['count_7d'][cells]
+    r30 = stats['count_30d'][cells]
+    rm = stats['mean_mag_30d'][cells]
+    # No major event inside the lookback window counts as "lookback days ago"
+    dslm = np.nan_to_num(stats['days_since_last_major'][cells], nan=float(lookback_days))
+    n = len(cells)
+    return {
+        'mag': stats['max_mag'][cells],
+        'depth': depth,
+        'lat': lat,
+        'lon': lon,
+        'rolling_count_7d': r7,
+        'rolling_count_30d': r30,
+        'rolling_mean_mag_30d': rm,
+        'days_since_last_major': dslm,
+        'recency_score': 1 / (dslm + 1),
+        'month_sin': np.full(n, 0.5),
+        'month_cos': np.full(n, 0.5),
+        'hour_sin': np.zeros(n),
+        'hour_cos': np.ones(n),
+        'depth_squared': depth ** 2,
+        'activity_ratio_7_30': r7 / (r30 + 1),
+        'recent_activity_score': r7 * rm,
+        'geo_cluster': np.zeros(n),
+    }
+
+
+class RiskSurface:
+    """
+    In-memory risk raster for one RiskGrid.
+
+    A full rebuild happens on first use, when the risk model version changes
+    and after `ttl` seconds (the time windows move on for every cell).
+    In between, mark_points() queues the cells hit by an ingest and the next
+    read re-aggregates and re-scores just those cells.
+    """
+
+    def __init__(self, grid: RiskGrid, lookback_days: int = 365, ttl: float = 3600):
+        self.grid = grid
+        self.lookback_days = lookback_days
+        self.ttl = ttl
+        self._lock = asyncio.Lock()
+        self._dirty = set()
+        self._expired = False
+        self._stats = None
+        self._values = None
+        self._payload = None
+        self.as_of = None
+        self.model_version = None
+        self.built_at = None
+        self.builds = 0
+        self.refreshes = 0
+        self.cells_refreshed = 0
+        self.last_build_ms = None
+        self.last_refresh_ms = None
+
+    def _stale(self, bundle) -> bool:
+        return (self._payload is None or self._expired or self.model_version != bundle.version
+                or time.monotonic() - self.built_at > self.ttl)
+
+    def mark_points(self, points) -> int:
+        """Queue the cells containing newly ingested (lat, lon) points -> cells queued"""
+        if self._payload is None:
+            return 0
+        cells = {self.grid.cell(lat, lon) for lat, lon in points} - {None}
+        self._dirty |= cells
+        return len(cells)
+
+    def invalidate(self):
+        """Rebuild from scratch on the next read (too many changes to track cell by cell)"""
+        self._expired = True
+        self._dirty.clear()
+
+    async def get(self, bundle, db_run, ml_run) -> dict:
+        """
+        Current raster payload, rebuilding or refreshing first if needed.
+        db_run(fn) runs fn(conn) on the database pool; ml_run(fn, *args) on the inference pool.
+        """
+        async with self._lock:
+            if self._stale(bundle):
+                started = time.perf_counter()
+                rows, as_of = await db_run(self._query_all)
+                await ml_run(self._apply, bundle, rows, as_of, None)
+                self.builds += 1
+                self.last_build_ms = round((time.perf_counter() - started) * 1000, 1)
+            elif self._dirty:
+                cells, self._dirty = self._dirty, set()
+                started = time.perf_counter()
+                try:
+                    rows, _ = await db_run(self._query_cells, cells)
+                    await ml_run(self._apply, bundle, rows, self.as_of, cells)
+                except BaseException:
+                    self._dirty |= cells
+                    raise
+                self.refreshes += 1
+                self.cells_refreshed += len(cells)
+                self.last_refresh_ms = round((time.perf_counter() - started) * 1000, 1)
+            return self._payload
+
+    # ── blocking halves (database pool / inference pool) ─────────────
+    def _query_all(self, conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(dt) AS as_of FROM std_sismicity")
+        # Windows are anchored at the newest event so an old catalog still gives a surface
+        as_of = cursor.fetchone()['as_of'] or datetime.now()
+        cursor.execute(*cell_stats_sql(self.grid, as_of, self.lookback_days))
+        return cursor.fetchall(), as_of
+
+    def _query_cells(self, conn, cells):
+        cursor = conn.cursor()
+        cursor.execute(*cell_stats_sql(self.grid, self.as_of, self.lookback_days, cells))
+        return cursor.fetchall(), self.as_of
+
+    def _apply(self, bundle, rows, as_of, cells):
+        grid = self.grid
+        if cells is None:
+            stats = {name: np.zeros(grid.size) for name in CELL_STATS}
+            stats['days_since_last_major'][:] = np.nan
+            values = np.full(grid.size, np.nan, dtype=np.float32)
+        else:
+            # Copy so a failed refresh leaves the published raster untouched
+            stats = {name: column.copy() for name, column in self._stats.items()}
+            values = self._values.copy()
+            touched = np.fromiter(cells, dtype=np.intp)
+            for column in stats.values():
+                column[touched] = 0
+            stats['days_since_last_major'][touched] = np.nan
+            values[touched] = np.nan
+
+        scored = []
+        for row in rows:
+            if 0 <= row['row'] < grid.rows and 0 <= row['col'] < grid.cols:
+                cell = row['row'] * grid.cols + row['col']
+                for name in CELL_STATS:
+                    value = row[name]
+                    stats[name][cell] = np.nan if value is None else float(value)
+                stats['mean_mag_30d'][cell] = np.nan_to_num(stats['mean_mag_30d'][cell])
+                scored.append(cell)
+
+        if scored:
+            scored = np.asarray(scored, dtype=np.intp)
+            features = cell_features(grid, stats, scored, self.lookback_days)
+            zeros = np.zeros(len(scored))
+            X = np.column_stack([features.get(name, zeros) for name in bundle.features])
+            values[scored] = bundle.extras['fused'].predict_many(X)
+
+        self._stats, self._values = stats, values
+        self.as_of = as_of
+        if cells is None:
+            self.model_version = bundle.version
+            self.built_at = time.monotonic()
+            self._expired = False
+        self._payload = self._build_payload(bundle)
+
+    def _build_payload(self, bundle) -> dict:
+        values = self._values
+        has_data = ~np.isnan(values)
+        return {
+            "bounds": self.grid.bounds(),
+            "step": self.grid.step,
+            "rows": self.grid.rows,
+            "cols": self.grid.cols,
+            "as_of": self.as_of.isoformat() if self.as_of else None,
+            "updated_at": datetime.now().isoformat(),
+            "model": bundle.name,
+            "model_version": bundle.version,
+            "cells_with_data": int(has_data.sum()),
+            "min": round(float(values[has_data].min()), 2) if has_data.any() else None,
+            "max": round(float(values[has_data].max()), 2) if has_data.any() else None,
+            # Row-major from the south-west corner; null = no events in the lookback window
+            "values": [None if v != v else v for v in np.round(values.astype(np.float64), 2).tolist()],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.grid.rows,
+            "cols": self.grid.cols,
+            "built": self._payload is not None,
+            "model_version": self.model_version,
+            "builds": self.builds,
+            "refreshes": self.refreshes,
+            "cells_refreshed": self.cells_refreshed,
+            "dirty_cells": len(self._dirty),
+            "last_build_ms": self.last_build_ms,
+            "last_refresh_ms": self.last_refresh_ms,
+        }
@@ -0,0 +1,183 @@
+"""
+Server-side map aggregation: Web Mercator tiles of pre-binned epicenter clusters
+Each z/x/y tile is split into TILE_BINS x TILE_BINS square bins; every non-empty
+bin comes back as one cluster (centroid, count, max/avg magnitude)
+"""
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from catalog import build_earthquake_filters
+
+TILE_BINS = 32
+MAX_TILE_ZOOM = 18
+# Web Mercator stops here; the squares above/below are not addressable
+MAX_MERCATOR_LAT = 85.0511287798
+
+TILE_FIELDS = ["lat", "lon", "count", "max_mag", "avg_mag"]
+
+
+def tile_bounds(z: int, x: int, y: int):
+    """(min_lat, min_lon, max_lat, max_lon) of a slippy-map tile"""
+    n = 2 ** z
+
+    def lat_at(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat_at(y + 1), x / n * 360.0 - 180.0, lat_at(y), (x + 1) / n * 360.0 - 180.0
+
+
+def tile_for_point(lat: float, lon: float, z: int):
+    """Tile (x, y) containing a point at zoom z"""
+    n = 2 ** z
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_sql(z: int, x: int, y: int, filters: dict):
+    """Per-bin aggregate query for one tile -> (sql, params)"""
+    where, params = build_earthquake_filters(**filters, bbox=tile_bounds(z, x, y))
+    scale = (2 ** z) * TILE_BINS
+    # Bin index = world pixel at zoom z (TILE_BINS px per tile) minus the tile origin;
+    # clamped because BETWEEN also admits points on the far edges
+    bin_x = f"LEAST({TILE_BINS - 1}, GREATEST(0, FLOOR((lon::float8 + 180) / 360 * %s) - %s))"
+    bin_y = (f"LEAST({TILE_BINS - 1}, GREATEST(0, FLOOR("
+             f"(1 - LN(TAN(PI() / 4 + RADIANS(lat::float8) / 2)) / PI()) / 2 * %s) - %s))")
+    sql = f"""
+        SELECT COUNT(*) AS count, MAX(mag) AS max_mag, AVG(mag) AS avg_mag,
+               AVG(lat) AS lat, AVG(lon) AS lon
+        FROM (
+            SELECT {bin_x} AS bin_x, {bin_y} AS bin_y, mag, lat, lon
+            FROM std_sismicity{where}
+        ) b
+        GROUP BY bin_x, bin_y
+    """
+    return sql, [scale, x * TILE_BINS, scale, y * TILE_BINS] + params
+
+
+def tile_payload(z: int, x: int, y: int, rows) -> dict:
+    """Compact JSON: one positional array per cluster, in TILE_FIELDS order"""
+    clusters = [
+        [round(float(r['lat']), 5), round(float(r['lon']), 5), int(r['count']),
+         float(r['max_mag']) if r['max_mag'] is not None else None,
+         round(float(r['avg_mag']), 2) if r['avg_mag'] is not None else None]
+        for r in rows
+    ]
+    return {
+        "z": z, "x": x, "y": y,
+        "bins": TILE_BINS,
+        "fields": TILE_FIELDS,
+        "total": sum(c[2] for c in clusters),
+        "clusters": clusters,
+    }
+
+
+class TileCache:
+    """
+    Per-process tile cache invalidated tile-by-tile.
+
+    Entries are grouped by (z, x, y) so an ingest only drops the tiles (at
+    every zoom) that contain a new epicenter; the rest of the map stays warm.
+    """
+
+    def __init__(self, max_tiles: int = 4096, ttl: float = 3600):
+        self.max_tiles = max_tiles
+        self.ttl = ttl
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        # Bumped on every invalidation so a tile computed across one is not stored
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.evictions = 0
+
+    def _get(self, tile, variant):
+        with self._lock:
+            entry = self._tiles.get(tile, {}).get(variant)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._tiles[tile][variant]
+                return None
+            self._tiles.move_to_end(tile)
+            return value
+
+    def _set(self, tile, variant, value, epoch):
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._tiles.setdefault(tile, {})[variant] = (time.monotonic() + self.ttl, value)
+            self._tiles.move_to_end(tile)
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_compute(self, tile, filters: dict, compute):
+        """Cached tile for (tile, filters), or await compute(); concurrent misses share one query"""
+        variant = json.dumps({k: v for k, v in filters.items() if v is not None}, sort_keys=True)
+        value = self._get(tile, variant)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        key = (tile, variant)
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        epoch = self._epoch
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            self._set(tile, variant, value, epoch)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate_points(self, points) -> int:
+        """Drop every cached tile containing one of the (lat, lon) points -> tiles dropped"""
+        dropped = 0
+        with self._lock:
+            self._epoch += 1
+            for lat, lon in points:
+                for z in range(MAX_TILE_ZOOM + 1):
+                    if self._tiles.pop((z, *tile_for_point(lat, lon, z)), None) is not None:
+                        dropped += 1
+            self.invalidated += dropped
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._tiles.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "tiles": len(self._tiles),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidated": self.invalidated,
+            "evictions": self.evictions,
+            "ttl_seconds": self.ttl,
+        }
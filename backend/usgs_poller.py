@@ -0,0 +1,223 @@
+"""
+Background USGS poller
+Asks the FDSN event service only for events updated since the last stored
+revision time (the watermark), hands them to the ingest callback, and backs
+off with jitter while USGS or the database is failing. With several API
+processes, an advisory lock elects the single one that polls
+"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import psycopg2
+import psycopg2.extensions
+
+USGS_FDSN_URL = "https://earthquake.usgs.gov/fdsnws/event/1/query"
+# FDSN caps a single query at 20000 events; larger catch-ups are paged with `offset`
+FDSN_MAX_LIMIT = 20000
+# Session-level advisory lock held by the one process that polls ("USGS" in ASCII)
+POLLER_LOCK_KEY = 0x55534753
+
+
+class AdvisoryLease:
+    """
+    Leadership through pg_try_advisory_lock on a dedicated connection: one
+    session holds the lock, and Postgres releases it as soon as that session
+    ends, so a standby takes over on its next attempt after the leader dies.
+    held() is blocking (call it through asyncio.to_thread).
+    """
+
+    def __init__(self, db_config: dict, key: int = POLLER_LOCK_KEY, keepalive_idle: int = 30):
+        self.db_config = db_config
+        self.key = key
+        self.keepalive_idle = keepalive_idle
+        self._conn = None
+        self.leader = False
+        self.elections = 0
+
+    def held(self) -> bool:
+        """Whether this process holds the lock, trying to take it if not"""
+        try:
+            if self._conn is None or self._conn.closed:
+                # A new session holds nothing, whatever the old one did
+                self.leader = False
+                # Keepalives: a dead link must end the session, or the lock is never freed
+                self._conn = psycopg2.connect(
+                    keepalives=1, keepalives_idle=self.keepalive_idle,
+                    keepalives_interval=10, keepalives_count=3, **self.db_config
+                )
+                self._conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            cursor = self._conn.cursor()
+            if self.leader:
+                # The lock lives exactly as long as the session: just check the session
+                cursor.execute("SELECT 1")
+            else:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", (self.key,))
+                self.leader = bool(cursor.fetchone()[0])
+                if self.leader:
+                    self.elections += 1
+            cursor.close()
+        except psycopg2.Error:
+            self.release()
+            raise
+        return self.leader
+
+    def release(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+        self._conn = None
+        self.leader = False
+
+
+class UsgsPoller:
+    """
+    load_watermark() is awaited once and returns the newest stored `updated`
+    (or None: start `lookback_hours` back). ingest(features) is awaited with
+    every non-empty page and must be idempotent, because a failed poll is
+    retried from the same watermark.
+
+    With a `lease` (AdvisoryLease) only the process holding it polls; the
+    others stand by, retrying the lease every interval. Without one, it polls
+    unconditionally.
+
+    Pass `transport` (e.g. httpx.MockTransport) or point `url` at a local
+    stub server to run it without touching USGS.
+    """
+
+    def __init__(self, ingest, load_watermark, url: str = USGS_FDSN_URL, interval: float = 60,
+                 min_magnitude: float = 2.5, lookback_hours: float = 24, timeout: float = 30,
+                 max_backoff: float = 900, jitter: float = 0.1, transport=None, lease=None):
+        self.ingest = ingest
+        self.load_watermark = load_watermark
+        self.url = url
+        self.interval = interval
+        self.min_magnitude = min_magnitude
+        self.lookback = timedelta(hours=lookback_hours)
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.transport = transport
+        self.lease = lease
+        self._client = None
+        self.watermark = None
+        self.failures = 0
+        self.polls = 0
+        self.errors = 0
+        self.events_seen = 0
+        self.last_poll_at = None
+        self.last_success_at = None
+        self.last_error = None
+        self.last_poll_ms = None
+        self.next_poll_in = None
+
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout, transport=self.transport,
+                                             headers={"User-Agent": "SeismoIQ/1.0"})
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self.lease is not None:
+            await asyncio.to_thread(self.lease.release)
+
+    async def is_leader(self) -> bool:
+        if self.lease is None:
+            return True
+        leader = await asyncio.to_thread(self.lease.held)
+        if not leader:
+            # The leader moves the watermark meanwhile: reload it if we take over
+            self.watermark = None
+        return leader
+
+    async def fetch(self, params: dict) -> list:
+        """GeoJSON features for an FDSN query (raises httpx.HTTPError)"""
+        response = await self.client().get(self.url, params={'format': 'geojson', **params})
+        response.raise_for_status()
+        if response.status_code == 204:
+            # FDSN "no data"
+            return []
+        return response.json().get('features', [])
+
+    # ── polling ──────────────────────────────────────────────────────
+    async def poll_once(self):
+        """One incremental fetch + ingest -> result of the last ingest (None if nothing changed)"""
+        self.polls += 1
+        self.last_poll_at = datetime.now(timezone.utc).isoformat()
+        started = time.perf_counter()
+        if self.watermark is None:
+            self.watermark = await self.load_watermark() or datetime.now(timezone.utc) - self.lookback
+
+        since = self.watermark.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3]
+        result, newest, offset = None, 0, 1
+        while True:
+            features = await self.fetch({
+                'updatedafter': since,
+                'minmagnitude': self.min_magnitude,
+                'orderby': 'time-asc',
+                'limit': FDSN_MAX_LIMIT,
+                'offset': offset,
+            })
+            if features:
+                result = await self.ingest(features)
+                self.events_seen += len(features)
+                newest = max([newest] + [f['properties'].get('updated') or 0 for f in features])
+            if len(features) < FDSN_MAX_LIMIT:
+                break
+            offset += FDSN_MAX_LIMIT
+        # Only move on once every page is stored
+        if newest:
+            self.watermark = max(self.watermark, datetime.fromtimestamp(newest / 1000, tz=timezone.utc))
+        self.last_poll_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.last_success_at = datetime.now(timezone.utc).isoformat()
+        return result
+
+    def delay(self) -> float:
+        """Seconds until the next poll: the interval with jitter, or capped exponential backoff after failures"""
+        if self.failures == 0:
+            return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        backoff = min(self.max_backoff, self.interval * 2 ** (self.failures - 1))
+        # "Equal jitter": at least half the backoff, so retries never bunch up at zero
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    async def run(self):
+        """Poll forever (run as a background task)"""
+        while True:
+            try:
+                if await self.is_leader():
+                    await self.poll_once()
+                self.failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failures += 1
+                self.errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"USGS poll failed ({self.failures} in a row): {self.last_error}")
+            self.next_poll_in = round(self.delay(), 1)
+            await asyncio.sleep(self.next_poll_in)
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "interval": self.interval,
+            "leader": self.lease.leader if self.lease is not None else True,
+            "elections": self.lease.elections if self.lease is not None else None,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "polls": self.polls,
+            "errors": self.errors,
+            "consecutive_failures": self.failures,
+            "events_seen": self.events_seen,
+            "last_poll_at": self.last_poll_at,
+            "last_success_at": self.last_success_at,
+            "last_poll_ms": self.last_poll_ms,
+            "last_error": self.last_error,
+            "next_poll_in": self.next_poll_in,
+        }
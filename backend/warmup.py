@@ -0,0 +1,137 @@
+"""
+Startup timing and readiness tracking for the SeismoIQ backend
+Records how long each startup phase took and warms slow subsystems
+(forecaster, chatbot) in the background so the first user request doesn't pay for them
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Subsystem states, in the order they normally move through
+PENDING, WARMING, READY, FAILED, DISABLED = "pending", "warming", "ready", "failed", "disabled"
+
+
+class Subsystem:
+    def __init__(self, name: str, required: bool):
+        self.name = name
+        self.required = required
+        self.state = PENDING
+        self.started = None
+        self.elapsed_ms = None
+        self.ready_at = None
+        self.error = None
+
+    def describe(self) -> dict:
+        return {
+            "state": self.state,
+            "required": self.required,
+            "elapsed_ms": self.elapsed_ms,
+            "ready_at": self.ready_at,
+            "error": self.error,
+        }
+
+
+class Readiness:
+    """
+    Startup phases (blocking, timed in order) plus subsystems that become
+    ready independently. The process counts as ready once every required
+    subsystem is; optional ones only affect the "warm" flag.
+    """
+
+    def __init__(self, started: float = None):
+        self.started = started if started is not None else time.perf_counter()
+        self.phases = {}
+        self.subsystems = {}
+        self.serving_at = None
+        self._tasks = set()
+
+    def add(self, name: str, required: bool = False) -> Subsystem:
+        self.subsystems[name] = Subsystem(name, required)
+        return self.subsystems[name]
+
+    def record(self, phase: str, elapsed_ms: float):
+        self.phases[phase] = round(elapsed_ms, 1)
+
+    @contextmanager
+    def phase(self, name: str):
+        """Time a startup phase; if a subsystem has the same name its state follows the phase"""
+        subsystem = self.subsystems.get(name)
+        if subsystem is not None:
+            subsystem.state, subsystem.started = WARMING, time.perf_counter()
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if subsystem is not None:
+                self._finish(subsystem, FAILED, str(e))
+            raise
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+        if subsystem is not None:
+            self._finish(subsystem, READY)
+
+    def mark(self, name: str, state: str, error: str = None):
+        subsystem = self.subsystems[name]
+        if state == WARMING:
+            subsystem.state, subsystem.started = WARMING, time.perf_counter()
+        else:
+            self._finish(subsystem, state, error)
+
+    def _finish(self, subsystem: Subsystem, state: str, error: str = None):
+        if subsystem.started is not None:
+            subsystem.elapsed_ms = round((time.perf_counter() - subsystem.started) * 1000, 1)
+        subsystem.state = state
+        subsystem.error = error
+        if state == READY:
+            subsystem.ready_at = datetime.now().isoformat()
+
+    def serving(self):
+        """Startup finished; the app is accepting requests"""
+        self.serving_at = time.perf_counter()
+
+    # ── background warmers ───────────────────────────────────────────
+    def warm(self, name: str, run, fn):
+        """
+        Build a subsystem in the background: `run(fn)` is awaited (e.g.
+        InferencePool.run or asyncio.to_thread). fn reports its own state
+        through phase(name), so a later lazy build on a request is tracked too.
+        """
+        async def warmer():
+            try:
+                await run(fn)
+            except Exception as e:
+                self.mark(name, FAILED, str(e))
+
+        task = asyncio.ensure_future(warmer())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def cancel(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+    # ── reporting ────────────────────────────────────────────────────
+    @property
+    def ready(self) -> bool:
+        return self.serving_at is not None and all(
+            s.state == READY for s in self.subsystems.values() if s.required
+        )
+
+    @property
+    def warm_done(self) -> bool:
+        return self.ready and all(s.state in (READY, DISABLED) for s in self.subsystems.values())
+
+    def describe(self) -> dict:
+        return {
+            "ready": self.ready,
+            "warm": self.warm_done,
+            "subsystems": {name: s.describe() for name, s in self.subsystems.items()},
+            "startup": {
+                "phases_ms": dict(self.phases),
+                "time_to_serving_ms": round((self.serving_at - self.started) * 1000, 1)
+                                      if self.serving_at is not None else None,
+            },
+            "uptime_s": round(time.perf_counter() - self.started, 1),
+        }
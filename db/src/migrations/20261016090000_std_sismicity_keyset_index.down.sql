@@ -0,0 +1,4 @@
+DROP INDEX IF EXISTS idx_std_sismicity_dt_id;
+
+ALTER TABLE std_sismicity DROP CONSTRAINT IF EXISTS std_sismicity_pkey;
+ALTER TABLE std_sismicity DROP COLUMN IF EXISTS id;
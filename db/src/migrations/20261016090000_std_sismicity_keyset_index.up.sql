@@ -0,0 +1,3 @@
+ALTER TABLE std_sismicity ADD COLUMN IF NOT EXISTS id SERIAL PRIMARY KEY;
+
+CREATE INDEX IF NOT EXISTS idx_std_sismicity_dt_id ON std_sismicity (dt DESC, id DESC);
@@ -0,0 +1,7 @@
+DROP TRIGGER IF EXISTS trg_sismicity_daily_counts_truncate ON std_sismicity;
+DROP TRIGGER IF EXISTS trg_sismicity_daily_counts_delete ON std_sismicity;
+DROP TRIGGER IF EXISTS trg_sismicity_daily_counts_update ON std_sismicity;
+DROP TRIGGER IF EXISTS trg_sismicity_daily_counts_insert ON std_sismicity;
+DROP FUNCTION IF EXISTS sismicity_daily_counts_reset();
+DROP FUNCTION IF EXISTS sismicity_daily_counts_apply();
+DROP TABLE sismicity_daily_counts;
@@ -0,0 +1,77 @@
+CREATE TABLE sismicity_daily_counts (
+    day DATE NOT NULL,
+    mag_bucket DECIMAL(3,1) NOT NULL,
+    is_major BOOLEAN NOT NULL,
+    event_count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, mag_bucket, is_major)
+);
+
+-- Statement-level so bulk ETL loads are aggregated once per statement, not once per row
+CREATE OR REPLACE FUNCTION sismicity_daily_counts_apply() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO sismicity_daily_counts (day, mag_bucket, is_major, event_count)
+        SELECT (dt AT TIME ZONE 'UTC')::date,
+               FLOOR(mag * 10) / 10,
+               COALESCE(is_major::boolean, FALSE),
+               -COUNT(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3
+        ON CONFLICT (day, mag_bucket, is_major)
+        DO UPDATE SET event_count = sismicity_daily_counts.event_count + EXCLUDED.event_count;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO sismicity_daily_counts (day, mag_bucket, is_major, event_count)
+        SELECT (dt AT TIME ZONE 'UTC')::date,
+               FLOOR(mag * 10) / 10,
+               COALESCE(is_major::boolean, FALSE),
+               COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3
+        ON CONFLICT (day, mag_bucket, is_major)
+        DO UPDATE SET event_count = sismicity_daily_counts.event_count + EXCLUDED.event_count;
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION sismicity_daily_counts_reset() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    TRUNCATE sismicity_daily_counts;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_sismicity_daily_counts_insert
+    AFTER INSERT ON std_sismicity
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sismicity_daily_counts_apply();
+
+CREATE TRIGGER trg_sismicity_daily_counts_update
+    AFTER UPDATE ON std_sismicity
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sismicity_daily_counts_apply();
+
+CREATE TRIGGER trg_sismicity_daily_counts_delete
+    AFTER DELETE ON std_sismicity
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sismicity_daily_counts_apply();
+
+CREATE TRIGGER trg_sismicity_daily_counts_truncate
+    AFTER TRUNCATE ON std_sismicity
+    FOR EACH STATEMENT EXECUTE FUNCTION sismicity_daily_counts_reset();
+
+-- Backfill from the existing catalog
+INSERT INTO sismicity_daily_counts (day, mag_bucket, is_major, event_count)
+SELECT (dt AT TIME ZONE 'UTC')::date,
+       FLOOR(mag * 10) / 10,
+       COALESCE(is_major::boolean, FALSE),
+       COUNT(*)
+FROM std_sismicity
+GROUP BY 1, 2, 3;
@@ -0,0 +1,10 @@
+DROP TRIGGER IF EXISTS trg_sismicity_rollups_truncate ON std_sismicity;
+DROP TRIGGER IF EXISTS trg_sismicity_rollups_delete ON std_sismicity;
+DROP TRIGGER IF EXISTS trg_sismicity_rollups_update ON std_sismicity;
+DROP TRIGGER IF EXISTS trg_sismicity_rollups_insert ON std_sismicity;
+DROP FUNCTION IF EXISTS sismicity_rollups_reset();
+DROP FUNCTION IF EXISTS sismicity_rollups_apply();
+DROP FUNCTION IF EXISTS sismicity_mag_class(NUMERIC);
+DROP INDEX IF EXISTS idx_std_sismicity_place;
+DROP TABLE sismicity_place_rollup;
+DROP TABLE sismicity_daily_rollup;
@@ -0,0 +1,185 @@
+CREATE TABLE sismicity_daily_rollup (
+    day DATE NOT NULL,
+    mag_class VARCHAR(10) NOT NULL,
+    event_count BIGINT NOT NULL DEFAULT 0,
+    mag_sum NUMERIC NOT NULL DEFAULT 0,
+    mag_min DECIMAL(3,1),
+    mag_max DECIMAL(3,1),
+    depth_sum NUMERIC NOT NULL DEFAULT 0,
+    dt_min TIMESTAMP WITH TIME ZONE,
+    dt_max TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (day, mag_class)
+);
+
+-- NULL places are kept under '' so they can share the primary key
+CREATE TABLE sismicity_place_rollup (
+    place VARCHAR(500) PRIMARY KEY,
+    event_count BIGINT NOT NULL DEFAULT 0,
+    mag_sum NUMERIC NOT NULL DEFAULT 0,
+    mag_max DECIMAL(3,1)
+);
+
+CREATE INDEX IF NOT EXISTS idx_std_sismicity_place ON std_sismicity (place);
+
+CREATE OR REPLACE FUNCTION sismicity_mag_class(mag NUMERIC) RETURNS VARCHAR
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT CASE
+        WHEN mag >= 5.5 THEN 'major'
+        WHEN mag >= 4 THEN 'moderate'
+        ELSE 'minor'
+    END
+$$;
+
+CREATE OR REPLACE FUNCTION sismicity_rollups_apply() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE sismicity_daily_rollup r
+        SET event_count = r.event_count - o.n,
+            mag_sum = r.mag_sum - o.mag_sum,
+            depth_sum = r.depth_sum - o.depth_sum
+        FROM (
+            SELECT (dt AT TIME ZONE 'UTC')::date AS day,
+                   sismicity_mag_class(mag) AS mag_class,
+                   COUNT(*) AS n,
+                   SUM(mag) AS mag_sum,
+                   SUM(depth) AS depth_sum
+            FROM old_rows
+            GROUP BY 1, 2
+        ) o
+        WHERE r.day = o.day
+          AND r.mag_class = o.mag_class;
+
+        UPDATE sismicity_place_rollup r
+        SET event_count = r.event_count - o.n,
+            mag_sum = r.mag_sum - o.mag_sum
+        FROM (
+            SELECT COALESCE(place, '') AS place, COUNT(*) AS n, SUM(mag) AS mag_sum
+            FROM old_rows
+            GROUP BY 1
+        ) o
+        WHERE r.place = o.place;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO sismicity_daily_rollup AS r (
+            day, mag_class, event_count, mag_sum, mag_min, mag_max, depth_sum, dt_min, dt_max
+        )
+        SELECT (dt AT TIME ZONE 'UTC')::date,
+               sismicity_mag_class(mag),
+               COUNT(*),
+               SUM(mag),
+               MIN(mag),
+               MAX(mag),
+               SUM(depth),
+               MIN(dt),
+               MAX(dt)
+        FROM new_rows
+        GROUP BY 1, 2
+        ON CONFLICT (day, mag_class) DO UPDATE SET
+            event_count = r.event_count + EXCLUDED.event_count,
+            mag_sum = r.mag_sum + EXCLUDED.mag_sum,
+            mag_min = LEAST(r.mag_min, EXCLUDED.mag_min),
+            mag_max = GREATEST(r.mag_max, EXCLUDED.mag_max),
+            depth_sum = r.depth_sum + EXCLUDED.depth_sum,
+            dt_min = LEAST(r.dt_min, EXCLUDED.dt_min),
+            dt_max = GREATEST(r.dt_max, EXCLUDED.dt_max);
+
+        INSERT INTO sismicity_place_rollup AS r (place, event_count, mag_sum, mag_max)
+        SELECT COALESCE(place, ''), COUNT(*), SUM(mag), MAX(mag)
+        FROM new_rows
+        GROUP BY 1
+        ON CONFLICT (place) DO UPDATE SET
+            event_count = r.event_count + EXCLUDED.event_count,
+            mag_sum = r.mag_sum + EXCLUDED.mag_sum,
+            mag_max = GREATEST(r.mag_max, EXCLUDED.mag_max);
+    END IF;
+
+    -- MIN/MAX cannot be decremented: drop emptied groups, recompute the rest from the catalog
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM sismicity_daily_rollup WHERE event_count <= 0;
+        DELETE FROM sismicity_place_rollup WHERE event_count <= 0;
+
+        UPDATE sismicity_daily_rollup r
+        SET mag_min = s.mag_min,
+            mag_max = s.mag_max,
+            dt_min = s.dt_min,
+            dt_max = s.dt_max
+        FROM (
+            SELECT DISTINCT (dt AT TIME ZONE 'UTC')::date AS day, sismicity_mag_class(mag) AS mag_class
+            FROM old_rows
+        ) o
+        CROSS JOIN LATERAL (
+            SELECT MIN(x.mag) AS mag_min, MAX(x.mag) AS mag_max, MIN(x.dt) AS dt_min, MAX(x.dt) AS dt_max
+            FROM std_sismicity x
+            WHERE x.dt >= o.day::timestamp AT TIME ZONE 'UTC'
+              AND x.dt < (o.day + 1)::timestamp AT TIME ZONE 'UTC'
+              AND sismicity_mag_class(x.mag) = o.mag_class
+        ) s
+        WHERE r.day = o.day
+          AND r.mag_class = o.mag_class;
+
+        UPDATE sismicity_place_rollup r
+        SET mag_max = (
+            SELECT MAX(x.mag)
+            FROM std_sismicity x
+            WHERE x.place = NULLIF(r.place, '')
+               OR (r.place = '' AND x.place IS NULL)
+        )
+        WHERE r.place IN (SELECT DISTINCT COALESCE(place, '') FROM old_rows);
+    END IF;
+
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION sismicity_rollups_reset() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    TRUNCATE sismicity_daily_rollup, sismicity_place_rollup;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_sismicity_rollups_insert
+    AFTER INSERT ON std_sismicity
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sismicity_rollups_apply();
+
+CREATE TRIGGER trg_sismicity_rollups_update
+    AFTER UPDATE ON std_sismicity
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sismicity_rollups_apply();
+
+CREATE TRIGGER trg_sismicity_rollups_delete
+    AFTER DELETE ON std_sismicity
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION sismicity_rollups_apply();
+
+CREATE TRIGGER trg_sismicity_rollups_truncate
+    AFTER TRUNCATE ON std_sismicity
+    FOR EACH STATEMENT EXECUTE FUNCTION sismicity_rollups_reset();
+
+-- Backfill from the existing catalog
+INSERT INTO sismicity_daily_rollup (
+    day, mag_class, event_count, mag_sum, mag_min, mag_max, depth_sum, dt_min, dt_max
+)
+SELECT (dt AT TIME ZONE 'UTC')::date,
+       sismicity_mag_class(mag),
+       COUNT(*),
+       SUM(mag),
+       MIN(mag),
+       MAX(mag),
+       SUM(depth),
+       MIN(dt),
+       MAX(dt)
+FROM std_sismicity
+GROUP BY 1, 2;
+
+INSERT INTO sismicity_place_rollup (place, event_count, mag_sum, mag_max)
+SELECT COALESCE(place, ''), COUNT(*), SUM(mag), MAX(mag)
+FROM std_sismicity
+GROUP BY 1;
@@ -0,0 +1,2 @@
+DROP INDEX IF EXISTS idx_std_sismicity_grid_cell_dt;
+ALTER TABLE std_sismicity DROP COLUMN grid_cell;
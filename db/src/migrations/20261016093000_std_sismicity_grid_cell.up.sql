@@ -0,0 +1,7 @@
+-- 1-degree grid cell for viewport / radius / polygon prefiltering without PostGIS.
+-- Must match catalog.grid_cells() in the backend.
+ALTER TABLE std_sismicity
+    ADD COLUMN grid_cell INTEGER
+    GENERATED ALWAYS AS (FLOOR(lat + 90)::INTEGER * 360 + FLOOR(lon + 180)::INTEGER) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_std_sismicity_grid_cell_dt ON std_sismicity (grid_cell, dt DESC);
@@ -0,0 +1,5 @@
+DROP INDEX IF EXISTS uq_std_sismicity_event_id;
+
+ALTER TABLE std_sismicity
+    DROP COLUMN IF EXISTS updated,
+    DROP COLUMN IF EXISTS event_id;
@@ -0,0 +1,7 @@
+-- USGS event id + revision time, so ingest can upsert instead of probing for duplicates.
+-- Rows from other sources keep event_id NULL (NULLs never conflict).
+ALTER TABLE std_sismicity
+    ADD COLUMN IF NOT EXISTS event_id VARCHAR(64),
+    ADD COLUMN IF NOT EXISTS updated TIMESTAMP WITH TIME ZONE;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_std_sismicity_event_id ON std_sismicity (event_id);
@@ -0,0 +1,3 @@
+DROP TRIGGER IF EXISTS trg_std_sismicity_notify_update ON std_sismicity;
+DROP TRIGGER IF EXISTS trg_std_sismicity_notify_insert ON std_sismicity;
+DROP FUNCTION IF EXISTS notify_std_sismicity_change();
@@ -0,0 +1,61 @@
+-- Push catalog changes to the API processes (LISTEN std_sismicity_events).
+-- One notification per 25 changed rows, each well under the 8000-byte NOTIFY limit:
+--   {"op": "I" | "U", "rows": [[id, event_id, epoch_ms, mag, depth, lat, lon, place, old_lat, old_lon], ...]}
+-- Statements changing more than 1000 rows (ETL reloads) send a single
+--   {"op": "bulk", "count": n}
+-- and listeners drop their caches instead of streaming every event.
+-- Must match pg_listener.parse_catalog_notify() in the backend.
+CREATE OR REPLACE FUNCTION notify_std_sismicity_change() RETURNS trigger AS $$
+DECLARE
+    changed BIGINT;
+    changes JSON;
+    payload TEXT;
+BEGIN
+    SELECT COUNT(*) INTO changed FROM new_rows;
+    IF changed > 1000 THEN
+        PERFORM pg_notify('std_sismicity_events', json_build_object('op', 'bulk', 'count', changed)::text);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT json_agg(json_build_array(
+                   n.id, n.event_id, FLOOR(EXTRACT(EPOCH FROM n.dt) * 1000)::BIGINT,
+                   n.mag, n.depth, n.lat, n.lon, LEFT(n.place, 64), NULL, NULL))
+        INTO changes
+        FROM new_rows n;
+    ELSE
+        -- Only real revisions; e.g. legacy rows adopting a USGS event id stay quiet
+        SELECT json_agg(json_build_array(
+                   n.id, n.event_id, FLOOR(EXTRACT(EPOCH FROM n.dt) * 1000)::BIGINT,
+                   n.mag, n.depth, n.lat, n.lon, LEFT(n.place, 64), o.lat, o.lon))
+        INTO changes
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE (n.dt, n.mag, n.depth, n.lat, n.lon, n.place)
+              IS DISTINCT FROM (o.dt, o.mag, o.depth, o.lat, o.lon, o.place);
+    END IF;
+    IF changes IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    FOR payload IN
+        SELECT json_build_object('op', LEFT(TG_OP, 1), 'rows', json_agg(e.value ORDER BY e.n))::text
+        FROM json_array_elements(changes) WITH ORDINALITY AS e (value, n)
+        GROUP BY (e.n - 1) / 25
+    LOOP
+        PERFORM pg_notify('std_sismicity_events', payload);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Statement-level with transition tables: a batched upsert costs one trigger call, not one per row
+CREATE TRIGGER trg_std_sismicity_notify_insert
+    AFTER INSERT ON std_sismicity
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_std_sismicity_change();
+
+CREATE TRIGGER trg_std_sismicity_notify_update
+    AFTER UPDATE ON std_sismicity
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_std_sismicity_change();
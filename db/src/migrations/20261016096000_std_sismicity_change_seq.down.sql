@@ -0,0 +1,52 @@
+-- Back to the 10-element NOTIFY rows
+CREATE OR REPLACE FUNCTION notify_std_sismicity_change() RETURNS trigger AS $$
+DECLARE
+    changed BIGINT;
+    changes JSON;
+    payload TEXT;
+BEGIN
+    SELECT COUNT(*) INTO changed FROM new_rows;
+    IF changed > 1000 THEN
+        PERFORM pg_notify('std_sismicity_events', json_build_object('op', 'bulk', 'count', changed)::text);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT json_agg(json_build_array(
+                   n.id, n.event_id, FLOOR(EXTRACT(EPOCH FROM n.dt) * 1000)::BIGINT,
+                   n.mag, n.depth, n.lat, n.lon, LEFT(n.place, 64), NULL, NULL))
+        INTO changes
+        FROM new_rows n;
+    ELSE
+        -- Only real revisions; e.g. legacy rows adopting a USGS event id stay quiet
+        SELECT json_agg(json_build_array(
+                   n.id, n.event_id, FLOOR(EXTRACT(EPOCH FROM n.dt) * 1000)::BIGINT,
+                   n.mag, n.depth, n.lat, n.lon, LEFT(n.place, 64), o.lat, o.lon))
+        INTO changes
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE (n.dt, n.mag, n.depth, n.lat, n.lon, n.place)
+              IS DISTINCT FROM (o.dt, o.mag, o.depth, o.lat, o.lon, o.place);
+    END IF;
+    IF changes IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    FOR payload IN
+        SELECT json_build_object('op', LEFT(TG_OP, 1), 'rows', json_agg(e.value ORDER BY e.n))::text
+        FROM json_array_elements(changes) WITH ORDINALITY AS e (value, n)
+        GROUP BY (e.n - 1) / 25
+    LOOP
+        PERFORM pg_notify('std_sismicity_events', payload);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_std_sismicity_change_seq ON std_sismicity;
+DROP FUNCTION IF EXISTS stamp_std_sismicity_change_seq();
+DROP INDEX IF EXISTS idx_std_sismicity_change_seq;
+
+ALTER TABLE std_sismicity DROP COLUMN IF EXISTS change_seq;
+
+DROP SEQUENCE IF EXISTS std_sismicity_change_seq;
@@ -0,0 +1,71 @@
+-- Global, gap-tolerant change sequence for the live feed: every inserted row and
+-- every real revision takes the next value, so a reconnecting client can ask for
+-- "everything after seq N" from any API process, even after its ring buffer rolled over.
+-- Rows loaded before this migration keep NULL (they predate any live client).
+CREATE SEQUENCE IF NOT EXISTS std_sismicity_change_seq;
+
+ALTER TABLE std_sismicity ADD COLUMN IF NOT EXISTS change_seq BIGINT;
+
+CREATE INDEX IF NOT EXISTS idx_std_sismicity_change_seq
+    ON std_sismicity (change_seq) WHERE change_seq IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION stamp_std_sismicity_change_seq() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND (NEW.dt, NEW.mag, NEW.depth, NEW.lat, NEW.lon, NEW.place)
+            IS NOT DISTINCT FROM (OLD.dt, OLD.mag, OLD.depth, OLD.lat, OLD.lon, OLD.place) THEN
+        RETURN NEW;
+    END IF;
+    NEW.change_seq := nextval('std_sismicity_change_seq');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_std_sismicity_change_seq
+    BEFORE INSERT OR UPDATE ON std_sismicity
+    FOR EACH ROW EXECUTE FUNCTION stamp_std_sismicity_change_seq();
+
+-- NOTIFY rows gain the change seq as an 11th element:
+--   [id, event_id, epoch_ms, mag, depth, lat, lon, place, old_lat, old_lon, change_seq]
+CREATE OR REPLACE FUNCTION notify_std_sismicity_change() RETURNS trigger AS $$
+DECLARE
+    changed BIGINT;
+    changes JSON;
+    payload TEXT;
+BEGIN
+    SELECT COUNT(*) INTO changed FROM new_rows;
+    IF changed > 1000 THEN
+        PERFORM pg_notify('std_sismicity_events', json_build_object('op', 'bulk', 'count', changed)::text);
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT json_agg(json_build_array(
+                   n.id, n.event_id, FLOOR(EXTRACT(EPOCH FROM n.dt) * 1000)::BIGINT,
+                   n.mag, n.depth, n.lat, n.lon, LEFT(n.place, 64), NULL, NULL, n.change_seq))
+        INTO changes
+        FROM new_rows n;
+    ELSE
+        -- Only real revisions; e.g. legacy rows adopting a USGS event id stay quiet
+        SELECT json_agg(json_build_array(
+                   n.id, n.event_id, FLOOR(EXTRACT(EPOCH FROM n.dt) * 1000)::BIGINT,
+                   n.mag, n.depth, n.lat, n.lon, LEFT(n.place, 64), o.lat, o.lon, n.change_seq))
+        INTO changes
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE (n.dt, n.mag, n.depth, n.lat, n.lon, n.place)
+              IS DISTINCT FROM (o.dt, o.mag, o.depth, o.lat, o.lon, o.place);
+    END IF;
+    IF changes IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    FOR payload IN
+        SELECT json_build_object('op', LEFT(TG_OP, 1), 'rows', json_agg(e.value ORDER BY e.n))::text
+        FROM json_array_elements(changes) WITH ORDINALITY AS e (value, n)
+        GROUP BY (e.n - 1) / 25
+    LOOP
+        PERFORM pg_notify('std_sismicity_events', payload);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
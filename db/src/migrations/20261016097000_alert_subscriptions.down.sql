@@ -0,0 +1,3 @@
+DROP TRIGGER IF EXISTS trg_alert_subscriptions_notify ON alert_subscriptions;
+DROP FUNCTION IF EXISTS notify_alert_subscription_change();
+DROP TABLE IF EXISTS alert_subscriptions;
@@ -0,0 +1,36 @@
+-- Earthquake alert subscriptions (one per user). Every API process keeps an
+-- in-memory match index and follows changes via LISTEN alert_subscriptions:
+--   {"op": "I" | "U" | "D", "user_id": ..., "email": ..., "magnitude": ..., "radius_km": ..., "lat": ..., "lon": ...}
+-- (deletes carry only op and user_id). Must match main.apply_alert_change() in the backend.
+CREATE TABLE IF NOT EXISTS alert_subscriptions (
+    id SERIAL PRIMARY KEY,
+    user_id VARCHAR(128) NOT NULL UNIQUE,
+    email VARCHAR(320) NOT NULL,
+    magnitude DECIMAL(3,1) NOT NULL,
+    radius_km DOUBLE PRECISION NOT NULL,
+    lat DOUBLE PRECISION NOT NULL,
+    lon DOUBLE PRECISION NOT NULL,
+    subscribed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE OR REPLACE FUNCTION notify_alert_subscription_change() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('alert_subscriptions',
+                          json_build_object('op', 'D', 'user_id', OLD.user_id)::text);
+    ELSE
+        PERFORM pg_notify('alert_subscriptions', json_build_object(
+            'op', LEFT(TG_OP, 1), 'user_id', NEW.user_id, 'email', NEW.email,
+            'magnitude', NEW.magnitude, 'radius_km', NEW.radius_km, 'lat', NEW.lat, 'lon', NEW.lon
+        )::text);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER trg_alert_subscriptions_notify
+    AFTER INSERT OR UPDATE OR DELETE ON alert_subscriptions
+    FOR EACH ROW EXECUTE FUNCTION notify_alert_subscription_change();
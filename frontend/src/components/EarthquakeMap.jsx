@@ -1,9 +1,19 @@
 import React, { useEffect, useRef } from 'react'
+import { tileService } from '../services/api'
 
-export default function EarthquakeMap({ events = [], height = 420 }) {
+// Tiles held client-side before the oldest are dropped
+const MAX_CACHED_TILES = 400
+
+// Pass `events` to plot individual epicenters, or `tileParams` (catalog
+// filters) to draw server-aggregated clusters for the visible tiles.
+// `riskGrid` (from /api/ai/risk-grid) is drawn underneath as a heat layer
+export default function EarthquakeMap({ events = [], tileParams = null, riskGrid = null, height = 420 }) {
   const mapRef     = useRef(null)
   const mapInstance= useRef(null)
   const markersRef = useRef([])
+  const riskLayer  = useRef(null)
+  const tileCache  = useRef(new Map())
+  const loadSeq    = useRef(0)
 
   const magColor = (m) =>
     m >= 7   ? '#b06aff' :
@@ -38,7 +48,107 @@ export default function EarthquakeMap({ events = [], height = 420 }) {
   useEffect(() => {
     const L   = window.L
     const map = mapInstance.current
-    if (!L || !map || !events.length) return
+    riskLayer.current?.remove()
+    riskLayer.current = null
+    if (!L || !map || !riskGrid) return
+
+    const { bounds, step, cols, values, min, max } = riskGrid
+    const span  = (max - min) || 1
+    const layer = L.layerGroup()
+    values.forEach((v, i) => {
+      if (v === null) return
+      const lat = bounds.min_lat + Math.floor(i / cols) * step
+      const lon = bounds.min_lon + (i % cols) * step
+      const t   = (v - min) / span
+      L.rectangle([[lat, lon], [lat + step, lon + step]], {
+        stroke:      false,
+        fillColor:   t >= 0.66 ? '#ff3d3d' : t >= 0.33 ? '#ff9f1c' : '#ffd700',
+        fillOpacity: 0.15 + t * 0.45,
+        interactive: false,
+      }).addTo(layer)
+    })
+    layer.addTo(map)
+    riskLayer.current = layer
+  }, [riskGrid])
+
+  useEffect(() => {
+    const L   = window.L
+    const map = mapInstance.current
+    if (!L || !map || !tileParams) return
+    const paramKey = JSON.stringify(tileParams)
+
+    const fetchTile = (z, x, y) => {
+      const key = `${z}/${x}/${y}?${paramKey}`
+      if (!tileCache.current.has(key)) {
+        if (tileCache.current.size >= MAX_CACHED_TILES)
+          tileCache.current.delete(tileCache.current.keys().next().value)
+        tileCache.current.set(key, tileService.getTile(z, x, y, tileParams).catch(() => {
+          tileCache.current.delete(key)
+          return null
+        }))
+      }
+      return tileCache.current.get(key)
+    }
+
+    const renderTiles = (tiles) => {
+      markersRef.current.forEach((m) => m.remove())
+      markersRef.current = []
+
+      tiles.forEach((tile) => tile?.clusters.forEach(([lat, lon, count, maxMag, avgMag]) => {
+        const r   = Math.max(4, Math.min(24, 4 + Math.log2(count) * 3))
+        const col = magColor(maxMag)
+
+        const circle = L.circleMarker([lat, lon], {
+          radius:      r,
+          fillColor:   col,
+          color:       col,
+          fillOpacity: 0.6,
+          weight:      1,
+          opacity:     0.9,
+        }).addTo(map)
+
+        circle.bindPopup(`
+          <div style="font-family:Space Grotesk,sans-serif;min-width:160px">
+            <b style="color:${col};font-size:16px">${count.toLocaleString()} event${count === 1 ? '' : 's'}</b><br/>
+            <hr style="border-color:#1e2535;margin:6px 0"/>
+            <span style="font-size:11px;color:#5a7a99">
+              Max: M ${Number(maxMag).toFixed(1)}<br/>
+              Avg: M ${Number(avgMag).toFixed(2)}
+            </span>
+          </div>
+        `, { className: 'seismo-popup' })
+
+        markersRef.current.push(circle)
+      }))
+    }
+
+    const loadTiles = () => {
+      const seq = ++loadSeq.current
+      const z   = Math.round(map.getZoom())
+      const n   = 2 ** z
+      const px  = map.getPixelBounds()
+      const requests = []
+      for (let x = Math.floor(px.min.x / 256); x <= Math.floor(px.max.x / 256); x++) {
+        for (let y = Math.max(0, Math.floor(px.min.y / 256)); y <= Math.min(n - 1, Math.floor(px.max.y / 256)); y++) {
+          requests.push(fetchTile(z, ((x % n) + n) % n, y))
+        }
+      }
+      // Only the latest pan/zoom gets to draw
+      Promise.all(requests).then((tiles) => { if (seq === loadSeq.current) renderTiles(tiles) })
+    }
+
+    loadTiles()
+    map.on('moveend', loadTiles)
+    return () => {
+      loadSeq.current++
+      map.off('moveend', loadTiles)
+    }
+  }, [JSON.stringify(tileParams)])
+
+  useEffect(() => {
+    const L   = window.L
+    const map = mapInstance.current
+    if (!L || !map || tileParams || !events.length) return
 
     // Remove old markers
     markersRef.current.forEach((m) => m.remove())
@@ -26,24 +26,69 @@ export function useFetch(fetchFn, deps = []) {
 }
 
 // ── useWebSocket ──────────────────────────────────────────────────────
+// Reconnects with backoff and resumes from the last sequence number seen,
+// so events published while the socket was down are replayed, not lost.
+// Replays start a little before that seq, so repeats are dropped here
 export function useWebSocket() {
   const setWsConnected  = useAppStore((s) => s.setWsConnected)
   const setLatestEvent  = useAppStore((s) => s.setLatestEvent)
   const setNotification = useAppStore((s) => s.setNotification)
+  const pushLiveEvents  = useAppStore((s) => s.pushLiveEvents)
 
   useEffect(() => {
     const WS_URL = import.meta.env.VITE_WS_URL || 'ws://localhost:8000'
     let ws
-    try {
-      ws = new WebSocket(`${WS_URL}/ws/live/`)
+    let ping
+    let retry
+    let attempts = 0
+    let lastSeq = null
+    let stopped = false
+    const seen = new Set()   // "event_id:seq" of recent events
+
+    const advance = (seq) => {
+      if (seq != null && (lastSeq == null || seq > lastSeq)) lastSeq = seq
+    }
+
+    const receive = (batch) => {
+      const events = batch.filter((e) => {
+        const key = `${e.event_id}:${e.seq}`
+        if (seen.has(key)) return false
+        seen.add(key)
+        return true
+      })
+      // Sets iterate in insertion order: forget the oldest
+      for (const key of seen) {
+        if (seen.size <= 2000) break
+        seen.delete(key)
+      }
+      if (!events.length) return
+      const latest = events[events.length - 1]
+      pushLiveEvents(events)
+      setLatestEvent(latest)
+      setNotification(`Live: M${latest.mag} at ${latest.place?.slice(0, 30)}`)
+    }
+
+    const connect = () => {
+      try {
+        ws = new WebSocket(`${WS_URL}/ws/live${lastSeq != null ? `?resume_from=${lastSeq}` : ''}`)
+      } catch (e) {
+        console.warn('[WS] Not available:', e.message)
+        return
+      }
 
       ws.onopen = () => {
+        attempts = 0
         setWsConnected(true)
         console.log('[WS] Connected')
       }
       ws.onclose = () => {
         setWsConnected(false)
-        console.log('[WS] Disconnected')
+        clearInterval(ping)
+        if (stopped) return
+        // 1s, 2s, 4s ... capped at 30s
+        const delay = Math.min(30000, 1000 * 2 ** attempts++)
+        console.log(`[WS] Disconnected, reconnecting in ${delay / 1000}s`)
+        retry = setTimeout(connect, delay)
       }
       ws.onmessage = (ev) => {
         try {
@@ -52,22 +97,32 @@ export function useWebSocket() {
             setLatestEvent(msg.data)
             setNotification(`Live: M${msg.data.mag} at ${msg.data.place?.slice(0, 30)}`)
           }
+          if (msg.type === 'new_events' || msg.type === 'replay') receive(msg.data)
+          if (msg.type === 'resync') setNotification('Live feed was offline for a while; refresh for the full list')
+          if (msg.type === 'dropped') {
+            // Fell behind and the server skipped messages: reconnect to replay them
+            ws.onmessage = null
+            ws.close()
+            return
+          }
+          advance(msg.seq)
         } catch {}
       }
       ws.onerror = () => setWsConnected(false)
 
       // Keep alive ping every 25s
-      const ping = setInterval(() => {
+      ping = setInterval(() => {
         if (ws.readyState === WebSocket.OPEN)
           ws.send(JSON.stringify({ type: 'ping' }))
       }, 25000)
+    }
 
-      return () => {
-        clearInterval(ping)
-        ws.close()
-      }
-    } catch (e) {
-      console.warn('[WS] Not available:', e.message)
+    connect()
+    return () => {
+      stopped = true
+      clearTimeout(retry)
+      clearInterval(ping)
+      ws?.close()
     }
   }, [])
 }
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from 'react'
+import { useAppStore } from '../store/useAppStore'
 
 export default function LiveFeed() {
   const [usgsData, setUsgsData] = useState([])
@@ -7,6 +8,7 @@ export default function LiveFeed() {
   const [hours, setHours] = useState(24)
   const [minMag, setMinMag] = useState(2.5)
   const [autoRefresh, setAutoRefresh] = useState(false)
+  const liveEvents = useAppStore((s) => s.liveEvents)
 
   const fetchUSGS = async () => {
     setLoading(true)
@@ -20,6 +22,7 @@ export default function LiveFeed() {
       const data = await response.json()
       
       const earthquakes = data.features.map(feature => ({
+        id: feature.id,
         time: new Date(feature.properties.time),
         mag: feature.properties.mag,
         place: feature.properties.place,
@@ -43,12 +46,25 @@ export default function LiveFeed() {
     fetchUSGS()
   }, [])
 
+  // Live mode merges events the backend poller pushes over the WebSocket
+  // instead of every browser re-downloading the feed from USGS
   useEffect(() => {
-    if (autoRefresh) {
-      const interval = setInterval(fetchUSGS, 60000) // Refresh every minute
-      return () => clearInterval(interval)
-    }
-  }, [autoRefresh, hours, minMag])
+    if (!autoRefresh || !liveEvents.length) return
+    const cutoff = new Date() - hours * 60 * 60 * 1000
+    setUsgsData((current) => {
+      const byId = new Map(current.map((eq) => [eq.id, eq]))
+      liveEvents.forEach((e) => {
+        const time = new Date(e.dt)
+        if (e.mag < minMag || time < cutoff) return
+        byId.set(e.event_id, {
+          id: e.event_id, time, mag: e.mag, place: e.place, depth: e.depth, lat: e.lat, lon: e.lon,
+          url: `https://earthquake.usgs.gov/earthquakes/eventpage/${e.event_id}`,
+        })
+      })
+      return [...byId.values()].sort((a, b) => a.time - b.time)
+    })
+    setLastFetch(new Date())
+  }, [autoRefresh, liveEvents])
 
   const magColor = (m) =>
     m >= 7   ? '#b06aff' :
@@ -161,7 +177,7 @@ export default function LiveFeed() {
                 cursor: 'pointer',
               }}
             >
-              {autoRefresh ? '✓ ON (1 min)' : 'OFF'}
+              {autoRefresh ? '✓ ON (live)' : 'OFF'}
             </button>
           </div>
 
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react'
-import { earthquakeService } from '../services/api'
+import { earthquakeService, aiService } from '../services/api'
 import { useFilters } from '../hooks'
 import EarthquakeMap from '../components/EarthquakeMap'
 import { Panel } from '../components/UI'
@@ -8,17 +8,23 @@ import FilterBar from '../components/FilterBar'
 
 export default function MapView() {
   const { params } = useFilters()
-  const [events,   setEvents]   = useState([])
+  const [total,    setTotal]    = useState(0)
   const [locations,setLocations] = useState([])
   const [loading,  setLoading]  = useState(true)
+  const [showRisk, setShowRisk] = useState(false)
+  const [riskGrid, setRiskGrid] = useState(null)
+
+  useEffect(() => {
+    if (showRisk && !riskGrid) aiService.getRiskGrid().then(setRiskGrid).catch(() => setShowRisk(false))
+  }, [showRisk])
 
   useEffect(() => {
     setLoading(true)
     Promise.all([
-      earthquakeService.getAll({ ...params, limit: 1500 }),
+      earthquakeService.getAll({ ...params, limit: 1 }),
       earthquakeService.getByLocation({ limit: 15 }),
     ]).then(([e, l]) => {
-      setEvents(e?.results || [])
+      setTotal(e?.count || 0)
       setLocations(l || [])
       setLoading(false)
     })
@@ -28,10 +34,16 @@ export default function MapView() {
     <>
       <FilterBar />
 
-      <Panel title=" Earthquake Epicenters" badge={`${events.length.toLocaleString()} EVENTS`}>
+      <div style={{ display: 'flex', gap: 8, marginBottom: 12 }}>
+        <button className={`filter-btn ${showRisk ? 'active' : ''}`} onClick={() => setShowRisk(!showRisk)}>
+           Risk Layer
+        </button>
+      </div>
+
+      <Panel title=" Earthquake Epicenters" badge={`${total.toLocaleString()} EVENTS`}>
         {loading
           ? <div className="spinner" />
-          : <EarthquakeMap events={events} height={480} />
+          : <EarthquakeMap tileParams={params} riskGrid={showRisk ? riskGrid : null} height={480} />
         }
       </Panel>
 
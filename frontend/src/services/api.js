@@ -36,11 +36,20 @@ export const earthquakeService = {
   getOne:       (id)     => api.get(`/api/earthquakes/${id}`),
 }
 
+// ── Map tile endpoints ────────────────────────────────────────────
+export const tileService = {
+  getTile: (z, x, y, params) => api.get(`/api/tiles/${z}/${x}/${y}`, { params }),
+}
+
 // ── ML / AI endpoints ─────────────────────────────────────────────
 export const aiService = {
   predictMagnitude: (data) => api.post('/api/ai/predict-magnitude', data),
   assessRisk:       (data) => api.post('/api/ai/assess-risk', data),
+  predictMagnitudeBatch: (items) => api.post('/api/ai/predict-magnitude/batch', { items }),
+  assessRiskBatch:       (items) => api.post('/api/ai/assess-risk/batch', { items }),
   getStatus:        ()     => api.get('/api/ai/status'),
+  getModels:        ()     => api.get('/api/ai/models'),
+  getRiskGrid:      ()     => api.get('/api/ai/risk-grid'),
 }
 
 // ── Forecasting endpoints ─────────────────────────────────────────
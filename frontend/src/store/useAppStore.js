@@ -29,4 +29,8 @@ export const useAppStore = create((set, get) => ({
   setWsConnected: (v) => set({ wsConnected: v }),
   latestEvent:  null,
   setLatestEvent: (e) => set({ latestEvent: e }),
+  // Events pushed by the backend USGS poller (newest last, capped)
+  liveEvents:   [],
+  pushLiveEvents: (events) =>
+    set((s) => ({ liveEvents: [...s.liveEvents, ...events].slice(-500) })),
 }))
@@ -20,10 +20,41 @@ from sklearn.metrics import (
     precision_recall_fscore_support
 )
 import joblib
+import json
 import psycopg2
 from datetime import datetime
 import os
 
+# One registry version per training run; the API hot-reloads the newest complete one
+REGISTRY_VERSION = datetime.now().strftime('%Y%m%dT%H%M%S')
+
+def save_bundle(name, model, scaler, feature_cols, metrics):
+    """Write registry/<name>/<REGISTRY_VERSION>/ (model + scaler + features + manifest)"""
+    model_dir = os.path.dirname(os.path.abspath(__file__))
+    path = os.path.join(model_dir, 'registry', name, REGISTRY_VERSION)
+    os.makedirs(path, exist_ok=True)
+
+    joblib.dump(model, os.path.join(path, 'model.pkl'))
+    joblib.dump(scaler, os.path.join(path, 'scaler.pkl'))
+    joblib.dump(feature_cols, os.path.join(path, 'features.pkl'))
+
+    manifest = {
+        'bundle': name,
+        'version': REGISTRY_VERSION,
+        'model': 'model.pkl',
+        'scaler': 'scaler.pkl',
+        'features': 'features.pkl',
+        'model_class': type(model).__name__,
+        'metrics': {k: round(float(v), 4) for k, v in metrics.items()},
+        'trained_at': datetime.now().isoformat(),
+    }
+    # The manifest goes last: a version only counts as complete once it exists
+    tmp_path = os.path.join(path, 'manifest.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, 'manifest.json'))
+    print(f"   Registry bundle: {name} @ {REGISTRY_VERSION}")
+
 def load_data_from_db():
     """Load data from PostgreSQL with enhanced error handling"""
     print("\n" + "="*70)
@@ -251,12 +282,14 @@ def train_advanced_magnitude_predictor(df):
     
     best_model = None
     best_r2 = -float('inf')
+    scores = {}
     
     for name, model in models.items():
         y_pred = model.predict(X_test_scaled)
         rmse = np.sqrt(mean_squared_error(y_test, y_pred))
         mae = mean_absolute_error(y_test, y_pred)
         r2 = r2_score(y_test, y_pred)
+        scores[name.strip()] = {'rmse': rmse, 'mae': mae, 'r2': r2}
         
         marker = "🥇" if name == ' ENSEMBLE' else "  "
         print(f"  {marker} {name:<23} {rmse:>10.4f} {mae:>10.4f} {r2:>10.4f}")
@@ -275,6 +308,9 @@ def train_advanced_magnitude_predictor(df):
     joblib.dump(scaler, os.path.join(model_dir, 'magnitude_scaler.pkl'))
     joblib.dump(feature_cols, os.path.join(model_dir, 'magnitude_features.pkl'))
     
+    save_bundle('magnitude', ensemble, scaler, feature_cols, scores['ENSEMBLE'])
+    save_bundle('magnitude_xgb', xgb_model, scaler, feature_cols, scores['XGBoost'])
+    
     print(f"\n   Models saved to: {model_dir}")
     
     return ensemble, scaler, feature_cols
@@ -414,6 +450,7 @@ def train_advanced_classifier(df):
     
     best_model = xgb_clf  # Default to XGBoost
     best_score = 0
+    scores = {}
     
     for name, model in [('XGBoost', xgb_clf), ('Random Forest', rf_clf), ('Neural Network', nn_clf)]:
         y_pred = model.predict(X_test_scaled)
@@ -426,6 +463,7 @@ def train_advanced_classifier(df):
         
         # Use accuracy as score if F1 is 0
         score = f1 if f1 > 0 else acc
+        scores[name] = {'accuracy': acc, 'precision': prec, 'recall': rec, 'f1': f1}
         
         marker = "🥇" if score >= best_score else "  "
         print(f"  {marker} {name:<23} {acc:>12.4f} {prec:>12.4f} {rec:>12.4f}")
@@ -457,6 +495,11 @@ def train_advanced_classifier(df):
     joblib.dump(scaler, os.path.join(model_dir, 'classifier_scaler.pkl'))
     joblib.dump(feature_cols, os.path.join(model_dir, 'classifier_features.pkl'))
     
+    best_name = next(n for n, m in [('XGBoost', xgb_clf), ('Random Forest', rf_clf), ('Neural Network', nn_clf)]
+                     if m is best_model)
+    save_bundle('classifier', best_model, scaler, feature_cols, scores[best_name])
+    save_bundle('classifier_xgb', xgb_clf, scaler, feature_cols, scores['XGBoost'])
+    
     print(f"\n   Classifiers saved to: {model_dir}")
     
     return best_model, scaler, feature_cols
@@ -531,6 +574,7 @@ def train_risk_assessment_system(df):
     joblib.dump(model, os.path.join(model_dir, 'risk_score_model.pkl'))
     joblib.dump(scaler, os.path.join(model_dir, 'risk_scaler.pkl'))
     joblib.dump(feature_cols, os.path.join(model_dir, 'risk_features.pkl'))
+    save_bundle('risk', model, scaler, feature_cols, {'rmse': rmse, 'mae': mae, 'r2': r2})
     
     print(f"\n   Risk model saved to: {model_dir}")
     
@@ -607,6 +651,7 @@ if __name__ == "__main__":
     print("      • risk_score_model.pkl")
     print("      • risk_scaler.pkl")
     print("      • risk_features.pkl")
+    print(f"\n Registry version: registry/<bundle>/{REGISTRY_VERSION}/ (picked up by the API without a restart)")
     
     print("\n Next Step: streamlit run visualization/app.py")
     print("="*70 + "\n")
\ No newline at end of file